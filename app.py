@@ -1,18 +1,35 @@
-import plotly.express as px
-import dash_bootstrap_components as dbc
-from dash import Dash, html, dcc
+import os
 
+import dash_bootstrap_components as dbc
+import numpy as np
+from dash import MATCH, Dash, Input, Output, State, html, dcc, no_update
+from dash.exceptions import PreventUpdate
+
+from src.accounts import trackedAccounts
+from src.aggregate import Aggregation
+from src.downsample import downsample
+from src.live import LivePoller
+from src.loader import BackgroundLoader
+from src.lru import LRUCache
+from src.metrics import METRICS, METRICS_BY_NAME
 from src.state import AppDataHandler
+from src.trend import TrendCache
 
 
 app = Dash(
     __name__,
-    external_stylesheets=[dbc.themes.SLATE]
+    external_stylesheets=[dbc.themes.SLATE],
+    suppress_callback_exceptions=True, # Tab contents (eg. the over time controls) are rendered on demand
 )
 
-dh = AppDataHandler(
-    role='CARRY',
-)
+# One AppDataHandler per tracked account (see src.accounts), all kept in memory - switching or comparing
+#   accounts only picks other partitions
+ACCOUNTS = trackedAccounts()
+handlers = {
+    account: AppDataHandler(role='CARRY', puuid=puuid)
+    for account, puuid in ACCOUNTS.items()
+}
+DEFAULT_ACCOUNT = next(iter(ACCOUNTS))
 
 ### FIGURES
 
@@ -20,26 +37,59 @@ standardTheming = {
     'template': 'plotly_dark'
 }
 
-
-def constructValueLineChart(value, y_axis, title, challenger_stat=None, silver_stat=None):
-    global dh
+# Above this many points a chart is drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+# At most this many points are sent per chart - the rest is downsampled away (see src.downsample)
+#   until the user zooms in far enough to see every point of the range
+MAX_POINTS = 2000
+DOWNSAMPLE_METHOD = 'lttb'
+
+
+def constructValueLineChart(df, value, y_axis, title, challenger_stat=None, silver_stat=None, y_range=None, trend=None, x_range=None):
+    # trend is a src.trend.Trend drawn over the points
+    # x_range limits the points to a zoomed in game_index range
+    # None if there isn't enough to draw a trendline through (eg. lane stats on Howling Abyss)
+    if value.count() < 2:
+        return None
+
+    points = value.notna()
+    if x_range is not None:
+        points &= df['game_index'].between(*x_range)
+    points = points.to_numpy().nonzero()[0]
+    if len(points) > MAX_POINTS:
+        # Trendline and y range still come from every game
+        points = points[downsample(df['game_index'].to_numpy()[points], value.to_numpy()[points], MAX_POINTS, DOWNSAMPLE_METHOD)]
+
+    import plotly.express as px # Slow to import - not needed until the first figure is built
     fig = px.scatter(
-        dh.match_summary_df,
+        df.iloc[points],
         x='game_index',
-        y=value,
+        y=value.iloc[points],
         labels={
             'y': y_axis,
             'game_index': 'Game Index',
         },
         title=title,
-        trendline='lowess',
-        trendline_options={
-            'frac': 0.1
-        },
-        trendline_color_override='white',
+        render_mode='webgl' if len(points) > WEBGL_THRESHOLD else 'svg',
         **standardTheming
     )
 
+    if trend is not None:
+        if len(trend.x) > MAX_POINTS:
+            # Per-game trends (eg. rolling median) get thinned out too - LTTB keeps the line's shape
+            keep = downsample(trend.x, trend.y, MAX_POINTS, 'lttb')
+            trend = trend._replace(**{
+                name: getattr(trend, name)[keep]
+                for name in ('x', 'y', 'lower', 'upper') if getattr(trend, name) is not None
+            })
+        if trend.lower is not None:
+            fig.add_scatter(x=trend.x, y=trend.upper, mode='lines', line_width=0, hoverinfo='skip', showlegend=False)
+            fig.add_scatter(
+                x=trend.x, y=trend.lower, mode='lines', line_width=0, hoverinfo='skip', showlegend=False,
+                fill='tonexty', fillcolor='rgba(255, 255, 255, 0.15)',
+            )
+        fig.add_scatter(x=trend.x, y=trend.y, mode='lines', line_color='white', showlegend=False)
+
     if challenger_stat is not None:
         maxval = max(value.max(), challenger_stat)    
     else:
@@ -51,7 +101,7 @@ def constructValueLineChart(value, y_axis, title, challenger_stat=None, silver_s
         minval = value.min()
     
 
-    fig.update_layout(yaxis_range=[0.9*minval, 1.1*maxval])
+    fig.update_layout(yaxis_range=[0.9*minval, 1.1*maxval] if y_range is None else y_range)
     fig.update_layout(margin=dict(
         l=0,
         r=0,
@@ -64,129 +114,90 @@ def constructValueLineChart(value, y_axis, title, challenger_stat=None, silver_s
     if silver_stat is not None:
         fig.add_hline(silver_stat, line_color='silver')
 
-    return fig
+    if x_range is not None:
+        fig.update_xaxes(range=x_range)
 
+    return fig
 
-dh.loadSummonersRiftData()
 
+# The page is served straight away - from the snapshot saved by the last load if there is one, or as a
+#   loading screen - while the data (re)loads in the background, every account at once
+loaders = {account: BackgroundLoader(dh) for account, dh in handlers.items()}
 
-# CS/Minute
-cspm = dh.match_summary_df['cs'] / (dh.match_summary_df['length'] / 60)
-fig_cspm = constructValueLineChart(
-    cspm,
-    'CS/Minute',
-    'CS Per Minute',
-    challenger_stat=7.1,
-    silver_stat=5.5,
-)
-# fig_cspm.update_layout(yaxis_range=[4.5, 10])
-
-# Gold/Minute
-gpm = dh.match_summary_df['gold'] / (dh.match_summary_df['length'] / 60)
-fig_gpm = constructValueLineChart(
-    gpm,
-    'Gold/Minute',
-    'Gold Per Minute',
-)
+# Live mode - poll the API for new games every LIVE_POLL_SECONDS and append them (None turns it off)
+# Every account is polled, through one shared rate limiter (see getData.UserDataInterface.forAccounts)
+LIVE_POLL_SECONDS = 300
+# How often open pages check whether new games came in
+PAGE_REFRESH_SECONDS = 30
+pollers = {}
 
-# Vision Score/Minute
-vsm = dh.match_summary_df['vision_score'] / (dh.match_summary_df['length'] / 3600)
-fig_vsm = constructValueLineChart(
-    vsm,
-    'Vision Score/Hour',
-    'Vision Score Per Game',
-    challenger_stat=44.8,
-    silver_stat=35.2,
-)
+# Under the debug reloader, the first process only watches files and runs the app in a second one
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    for account, dh in handlers.items():
+        dh.loadSnapshot()
+        loaders[account].start()
 
-# Damage/Gold
-dpg = dh.match_summary_df['dmg_champions'] / dh.match_summary_df['gold']
-fig_dpg = constructValueLineChart(
-    dpg,
-    'Damage/Gold',
-    'Damage Per Gold',
-    challenger_stat=1.74,
-    silver_stat=1.77,
-)
+    if LIVE_POLL_SECONDS is not None:
+        from getData import UserDataInterface
+        for account, udi in zip(ACCOUNTS, UserDataInterface().forAccounts()):
+            pollers[account] = LivePoller(handlers[account], udi.pollRecent, interval=LIVE_POLL_SECONDS, loader=loaders[account])
+            pollers[account].start()
 
-# KDA Ratio
-kda = (dh.match_summary_df['kills'] + dh.match_summary_df['assists']) / dh.match_summary_df['deaths'].replace(0, 1)
-fig_kda = constructValueLineChart(
-    kda,
-    'KDA',
-    'KDA Ratio',
-    challenger_stat=2.55,
-    silver_stat=2.57,
-)
-fig_kda.update_layout(yaxis_range=[0, 5])
-
-# Kill Participation
-kp = (dh.match_summary_df['kills'] + dh.match_summary_df['assists']) / dh.match_summary_df['total_team_kills'] * 100
-fig_kp = constructValueLineChart(
-    kp,
-    'Kill Participation %',
-    'Kill Participation',
-    challenger_stat=48.1,
-    silver_stat=46.2,
-)
 
-# Damage Per Death
-dpd = dh.match_summary_df['dmg_champions'] / dh.match_summary_df['deaths'].replace(0, 1)
-fig_dpd = constructValueLineChart(
-    dpd,
-    'Damage/Death',
-    'Damage Per Death',
-    challenger_stat=3863,
-    silver_stat=3693,
-)
-fig_dpd.update_layout(yaxis_range=[0, 15_000])
-
-# Damage Share
-dsh = dh.match_summary_df['dmg_champions'] / dh.match_summary_df['total_team_dmg_champions'] * 100
-fig_dsh = constructValueLineChart(
-    dsh,
-    'Damage Share %',
-    'Damage Share',
-    challenger_stat=22.8,
-    silver_stat=21.0,
-)
+# Every metric in src.metrics.METRICS can be drawn - the trendline engine comes from src.trend.TRENDLINES,
+#   DEFAULT_TRENDLINE unless overridden in TRENDLINE_OVERRIDES
+DEFAULT_TRENDLINE = ('lowess', {'frac': 0.1})
+TRENDLINE_OVERRIDES = {
+    'kda': ('median', {'window': 25}),
+}
 
-# Gold Diff / 15min
-gd15 = dh.match_summary_df['gd15']
-fig_gd15 = constructValueLineChart(
-    gd15,
-    'Gold Difference',
-    'Gold Difference @ 15 Minutes',
-    challenger_stat=144,
-    silver_stat=128,
-)
-fig_gd15.update_layout(yaxis_range=[-2000, 2000])
-
-# CS Diff / 15min
-csdiff15 = dh.match_summary_df['csdiff15']
-fig_csdiff15 = constructValueLineChart(
-    csdiff15,
-    'CS Difference',
-    'CS Difference @ 15 Minutes',
-    challenger_stat=2.4,
-    silver_stat=2.1,
-)
-fig_csdiff15.update_layout(yaxis_range=[-50, 50])
+# Built figures, shared by every session - a reload or tab switch reuses them
+figure_cache = LRUCache()
+# Fitted trendlines, extended rather than refitted when new games get appended
+trend_cache = TrendCache()
+
+
+def buildFigure(account, snapshot, metric, game_map, role, x_range=None):
+    # Figure JSON for one metric of one partition, or None if there isn't enough data
+    df = handlers[account].metrics(game_map, role, snapshot)
+    spec = METRICS_BY_NAME[metric]
+    value = df[metric]
+    method, options = TRENDLINE_OVERRIDES.get(metric, DEFAULT_TRENDLINE)
+    trend = trend_cache.get((account, metric, game_map, role), method, df['game_index'], value, **options)
+    fig = constructValueLineChart(
+        df, value, spec.axis, spec.title, spec.challenger, spec.silver, spec.y_range, trend=trend, x_range=x_range,
+    )
+    if fig is None:
+        return None
+    return fig.update_layout(
+        template='plotly_dark',
+        plot_bgcolor= 'rgba(0, 0, 0, 0)',
+        paper_bgcolor= 'rgba(0, 0, 0, 0)',
+        height=300,
+    ).to_plotly_json()
+
+
+def getFigure(account, metric, game_map, role):
+    # Unzoomed figures get cached - zoomed ones are one-offs
+    # Data versions differ between accounts, so they don't share figures
+    snapshot = handlers[account].snapshot
+    return figure_cache.get(
+        (snapshot.version, metric, (game_map, role)),
+        lambda: buildFigure(account, snapshot, metric, game_map, role),
+    )
 
 
 # Following two functions were modified from https://stackoverflow.com/a/63602391/7247528
 # Figure wrapper
-def drawFigure(fig, height=300):
+def drawFigure(fig, metric):
+    if fig is None:
+        return drawText('Not enough games')
     return  html.Div([
         dbc.Card(
             dbc.CardBody([
                 dcc.Graph(
-                    figure=fig.update_layout(
-                        template='plotly_dark',
-                        plot_bgcolor= 'rgba(0, 0, 0, 0)',
-                        paper_bgcolor= 'rgba(0, 0, 0, 0)',
-                        height=height,
-                    ),
+                    id={'type': 'metric-graph', 'metric': metric},
+                    figure=fig,
                     config={
                         'displayModeBar': False
                     },
@@ -209,112 +220,517 @@ def drawText(text):
         ),
     ])
 
-combat_stats_tab = cardBodyWrapper(
-    dbc.Row([
-        dbc.Col([
-            drawText('Placeholder')
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_kda)
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_kp)
-        ], width=3),
-    ], align='center'),
-    html.Br(),
-    dbc.Row([
-        dbc.Col([
-            drawText('Utility Score')
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_dpd)
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_dsh)
-        ], width=3),
-    ], align='center'),
-)
-
-income_stats_tab = cardBodyWrapper(
-    dbc.Row([
-        dbc.Col([
-            drawText('Placeholder')
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_dpg)
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_gd15)
-        ], width=3),
-    ], align='center'), 
-    html.Br(),
-    dbc.Row([
-        dbc.Col([
-            drawFigure(fig_csdiff15)
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_cspm)
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_gpm)
-        ], width=3),
-    ], align='center'), 
-    # html.Br(),
-    # dbc.Row([
-    #     dbc.Col([
-    #         drawText('Placeholder')
-    #     ], width=3),
-    # ], align='center'),
-)
 
-map_control_stats_tab = cardBodyWrapper(
-    dbc.Row([
-        dbc.Col([
-            drawText('Placeholder')
-        ], width=3),
-        dbc.Col([
-            drawText('Objective Control Ratio')
-        ], width=3),
-        dbc.Col([
-            drawFigure(fig_vsm)
-        ], width=3),
-    ], align='center'),
-    dbc.Row([
-        dbc.Col([
-            drawText('Roam Dominance Score')
-        ], width=3),
-        dbc.Col([
-            drawText('Kill Conversion Ratio')
-        ], width=3),
-    ], align='center'),
-)
+# Contents of each stats tab - graph(metric) draws the figure for the selected partition
+def combatStatsTab(graph):
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                drawText('Placeholder')
+            ], width=3),
+            dbc.Col([
+                graph('kda')
+            ], width=3),
+            dbc.Col([
+                graph('kp')
+            ], width=3),
+        ], align='center'),
+        html.Br(),
+        dbc.Row([
+            dbc.Col([
+                drawText('Utility Score')
+            ], width=3),
+            dbc.Col([
+                graph('dpd')
+            ], width=3),
+            dbc.Col([
+                graph('dsh')
+            ], width=3),
+        ], align='center'),
+    )
 
 
-# Build app
-client_stats_tab = dbc.Card(
-    dbc.CardBody([
+def incomeStatsTab(graph):
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                drawText('Placeholder')
+            ], width=3),
+            dbc.Col([
+                graph('dpg')
+            ], width=3),
+            dbc.Col([
+                graph('gd15')
+            ], width=3),
+        ], align='center'), 
+        html.Br(),
+        dbc.Row([
+            dbc.Col([
+                graph('csdiff15')
+            ], width=3),
+            dbc.Col([
+                graph('cspm')
+            ], width=3),
+            dbc.Col([
+                graph('gpm')
+            ], width=3),
+        ], align='center'), 
+        # html.Br(),
         # dbc.Row([
         #     dbc.Col([
-        #         drawText('Client Stats')
+        #         drawText('Placeholder')
         #     ], width=3),
-        # ], align='center'), 
-        # html.Br(),
-        dbc.Tabs([
-            dbc.Tab(combat_stats_tab, label='Combat'),
-            dbc.Tab(income_stats_tab, label='Income'),
-            dbc.Tab(map_control_stats_tab, label='Map Control'),
+        # ], align='center'),
+    )
+
+
+def mapControlStatsTab(graph):
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                drawText('Placeholder')
+            ], width=3),
+            dbc.Col([
+                drawText('Objective Control Ratio')
+            ], width=3),
+            dbc.Col([
+                graph('vsm')
+            ], width=3),
+        ], align='center'),
+        dbc.Row([
+            dbc.Col([
+                drawText('Roam Dominance Score')
+            ], width=3),
+            dbc.Col([
+                drawText('Kill Conversion Ratio')
+            ], width=3),
+        ], align='center'),
+    )
+
+
+# Stats over time - see src.aggregate
+OVER_TIME_AGGREGATIONS = {
+    'daily': ('Daily', Aggregation('daily')),
+    'weekly': ('Weekly', Aggregation('weekly')),
+    'patch': ('Per Patch', Aggregation('patch')),
+    'games-20': ('Last 20 Games', Aggregation('games', 20)),
+    'days-30': ('Last 30 Days', Aggregation('days', 30)),
+}
+
+
+def overTimeTab(graph):
+    # Controls only - the chart is drawn by drawOverTime, the slider picks a range of buckets/games
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(
+                    id='over-time-metric',
+                    options=[{'label': metric.title, 'value': metric.name} for metric in METRICS],
+                    value=METRICS[0].name,
+                    clearable=False,
+                ),
+            ], width=4),
+            dbc.Col([
+                dcc.Dropdown(
+                    id='over-time-aggregation',
+                    options=[{'label': label, 'value': name} for name, (label, _) in OVER_TIME_AGGREGATIONS.items()],
+                    value='weekly',
+                    clearable=False,
+                ),
+            ], width=4),
+            dbc.Col([
+                dcc.Dropdown(
+                    id='over-time-compare',
+                    options=[{'label': f'Compare with {account}', 'value': account} for account in ACCOUNTS],
+                    value=[],
+                    multi=True,
+                    placeholder='Compare with...',
+                ),
+            ], width=4, style={} if len(ACCOUNTS) > 1 else {'display': 'none'}),
         ]),
-    ]), color = 'dark'
-)
+        html.Br(),
+        dcc.Graph(id='over-time-graph', config={'displayModeBar': False}),
+        dcc.RangeSlider(id='over-time-range', min=0, max=0, step=1, value=[0, 0]),
+    )
+
+
+# Per champion (or other grouping) performance with confidence intervals - see src.bootstrap
+# Groups with fewer games than GROUP_MIN_GAMES are left out, their intervals are too wide to read
+GROUP_MIN_GAMES = 3
+GROUPING_LABELS = {
+    'champion': 'Champion',
+    'patch': 'Patch',
+    'lane': 'Lane',
+}
+
+
+def groupsTab(graph):
+    # Controls only - the chart is drawn by drawGroups
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(
+                    id='groups-metric',
+                    options=[{'label': metric.title, 'value': metric.name} for metric in METRICS],
+                    value=METRICS[0].name,
+                    clearable=False,
+                ),
+            ], width=4),
+            dbc.Col([
+                dcc.Dropdown(
+                    id='groups-grouping',
+                    options=[{'label': label, 'value': name} for name, label in GROUPING_LABELS.items()],
+                    value='champion',
+                    clearable=False,
+                ),
+            ], width=3),
+            dbc.Col([
+                dcc.Dropdown(
+                    id='groups-method',
+                    options=[
+                        {'label': '95% bootstrap interval', 'value': 'bootstrap'},
+                        {'label': '95% normal interval', 'value': 'analytic'},
+                    ],
+                    value='bootstrap',
+                    clearable=False,
+                ),
+            ], width=3),
+        ]),
+        html.Br(),
+        dcc.Graph(id='groups-graph', config={'displayModeBar': False}),
+    )
+
+
+# Games and stats per lane opponent, teammate, ... - see src.matchups
+MATCHUP_KIND_LABELS = {
+    'opponent': 'Lane Opponent',
+    'ally': 'Allied Champion',
+    'enemy': 'Enemy Champion',
+    'duo': 'Duo Partner',
+}
+MATCHUP_METRICS = ('winrate', 'gd15', 'csdiff15', 'kda')
+MATCHUP_MIN_GAMES = 2
+
+
+def matchupsTab(graph):
+    # Controls only - the table is filled in by drawMatchups
+    return cardBodyWrapper(
+        dbc.Row([
+            dbc.Col([
+                dcc.Dropdown(
+                    id='matchups-kind',
+                    options=[{'label': label, 'value': kind} for kind, label in MATCHUP_KIND_LABELS.items()],
+                    value='opponent',
+                    clearable=False,
+                ),
+            ], width=4),
+        ]),
+        html.Br(),
+        html.Div(id='matchups-table'),
+    )
+
+
+STAT_TABS = {
+    'combat': combatStatsTab,
+    'income': incomeStatsTab,
+    'map-control': mapControlStatsTab,
+    'over-time': overTimeTab,
+    'groups': groupsTab,
+    'matchups': matchupsTab,
+}
+
+
+# Build app
+# Nothing is built up front - each tab's figures are made (or fetched from figure_cache) when it's shown
+# Every role was loaded up front too, so switching only swaps the partition in memory
+ALL_ROLES = 'ALL'
+
+
+def roleOptions(account):
+    return [{'label': 'All roles', 'value': ALL_ROLES}] + [
+        {'label': role.title(), 'value': role}
+        for game_map, role in handlers[account].partitions if game_map == 'summoners_rift' and role is not None
+    ]
+
 
 app.layout = html.Div([
+    html.Div(
+        dcc.Dropdown(
+            id='account-select',
+            options=[{'label': account, 'value': account} for account in ACCOUNTS],
+            value=DEFAULT_ACCOUNT,
+            clearable=False,
+        ),
+        style={} if len(ACCOUNTS) > 1 else {'display': 'none'},
+    ),
     dbc.Tabs([
-        dbc.Tab(client_stats_tab, label='Client Stats'),
-        dbc.Tab(html.Div(), label='ARAM Stats', disabled=True),
-    ])
+        dbc.Tab(label='Client Stats', tab_id='summoners_rift'),
+        dbc.Tab(label='ARAM Stats', tab_id='howling_abyss'),
+    ], id='map-tabs', active_tab='summoners_rift'),
+    dbc.Card(
+        dbc.CardBody([
+            html.Div(
+                dcc.Dropdown(
+                    id='role-select',
+                    options=[],
+                    value=handlers[DEFAULT_ACCOUNT].role or ALL_ROLES,
+                    clearable=False,
+                ),
+                id='role-select-wrapper',
+            ),
+            dbc.Tabs([
+                dbc.Tab(label='Combat', tab_id='combat'),
+                dbc.Tab(label='Income', tab_id='income'),
+                dbc.Tab(label='Map Control', tab_id='map-control'),
+                dbc.Tab(label='Over Time', tab_id='over-time'),
+                dbc.Tab(label='By Champion', tab_id='groups'),
+                dbc.Tab(label='Matchups', tab_id='matchups'),
+            ], id='stat-tabs', active_tab='combat'),
+            html.Div(id='stat-content'),
+        ]), color = 'dark'
+    ),
+    # Version of the data the page shows - the page redraws when a background load or live update changes it
+    dcc.Store(id='data-version'),
+    dcc.Interval(id='data-poll', interval=2000),
 ])
 
 
+@app.callback(
+    Output('data-version', 'data'),
+    Output('data-poll', 'interval'),
+    Output('data-poll', 'disabled'),
+    Input('data-poll', 'n_intervals'),
+    State('data-version', 'data'),
+)
+def pollData(_, shown_version):
+    # Polls quickly while the first loads run, then slowly for live updates (or not at all without them)
+    loading = any(loader.loading for loader in loaders.values())
+    interval = 2000 if loading else PAGE_REFRESH_SECONDS * 1000
+    disabled = not loading and not pollers
+    data_version = '|'.join(str(dh.data_version) for dh in handlers.values())
+    if data_version == shown_version:
+        return no_update, interval, disabled
+    return data_version, interval, disabled
+
+
+@app.callback(
+    Output('stat-content', 'children'),
+    Output('role-select-wrapper', 'style'),
+    Output('role-select', 'options'),
+    Input('account-select', 'value'),
+    Input('map-tabs', 'active_tab'),
+    Input('stat-tabs', 'active_tab'),
+    Input('role-select', 'value'),
+    Input('data-version', 'data'),
+)
+def renderStatTab(account, game_map, stat_tab, role, _):
+    role_style = {'display': 'none'} if game_map == 'howling_abyss' else {}
+    if handlers[account].snapshot is None:
+        loading_text = 'Loading match data...' if loaders[account].error is None else 'Loading match data failed'
+        return drawText(loading_text), role_style, roleOptions(account)
+    role = partitionRole(game_map, role)
+    graph = lambda metric: drawFigure(getFigure(account, metric, game_map, role), metric)
+    return STAT_TABS[stat_tab](graph), role_style, roleOptions(account)
+
+
+@app.callback(
+    Output({'type': 'metric-graph', 'metric': MATCH}, 'figure'),
+    Input({'type': 'metric-graph', 'metric': MATCH}, 'relayoutData'),
+    State({'type': 'metric-graph', 'metric': MATCH}, 'id'),
+    State('account-select', 'value'),
+    State('map-tabs', 'active_tab'),
+    State('role-select', 'value'),
+    prevent_initial_call=True,
+)
+def zoomFigure(relayout, graph_id, account, game_map, role):
+    # Downsampled charts reload the points of the zoomed in range at full resolution
+    role = partitionRole(game_map, role)
+    dh = handlers[account]
+    snapshot = dh.snapshot
+    if snapshot is None or len(dh.partition(game_map, role, snapshot)) <= MAX_POINTS or not relayout:
+        raise PreventUpdate
+
+    metric = graph_id['metric']
+    if relayout.get('xaxis.autorange'):
+        return getFigure(account, metric, game_map, role)
+    if 'xaxis.range[0]' in relayout:
+        x_range = [relayout['xaxis.range[0]'], relayout['xaxis.range[1]']]
+    elif 'xaxis.range' in relayout:
+        x_range = relayout['xaxis.range']
+    else:
+        raise PreventUpdate # Not a zoom
+    return buildFigure(account, snapshot, metric, game_map, role, x_range=x_range)
+
+
+def overTimeLabel(label):
+    return label if isinstance(label, str) else label.strftime('%Y-%m-%d')
+
+
+@app.callback(
+    Output('over-time-range', 'max'),
+    Output('over-time-range', 'value'),
+    Output('over-time-range', 'marks'),
+    Input('over-time-aggregation', 'value'),
+    State('account-select', 'value'),
+    State('map-tabs', 'active_tab'),
+    State('role-select', 'value'),
+)
+def overTimeRange(aggregation, account, game_map, role):
+    # The slider covers every bucket/game, and starts out selecting all of them
+    dh = handlers[account]
+    if dh.snapshot is None:
+        raise PreventUpdate
+    out = dh.aggregate(game_map, partitionRole(game_map, role), OVER_TIME_AGGREGATIONS[aggregation][1])
+    last = max(len(out) - 1, 0)
+    marks = {int(i): overTimeLabel(out.index[i]) for i in np.linspace(0, last, min(len(out), 6)).astype(int)}
+    return last, [0, last], marks
+
+
+@app.callback(
+    Output('over-time-graph', 'figure'),
+    Input('over-time-metric', 'value'),
+    Input('over-time-aggregation', 'value'),
+    Input('over-time-range', 'value'),
+    Input('over-time-compare', 'value'),
+    State('account-select', 'value'),
+    State('map-tabs', 'active_tab'),
+    State('role-select', 'value'),
+)
+def drawOverTime(metric, aggregation, selected, compare, account, game_map, role):
+    # Aggregations are cached (and extended on live updates), so moving the slider only slices one
+    if handlers[account].snapshot is None:
+        raise PreventUpdate
+    role = partitionRole(game_map, role)
+    aggregation = OVER_TIME_AGGREGATIONS[aggregation][1]
+    out = handlers[account].aggregate(game_map, role, aggregation)[metric].iloc[selected[0]:selected[1] + 1]
+
+    # Compared accounts show their medians over the same dates/patches
+    others = {}
+    for other in compare or []:
+        if other == account or handlers[other].snapshot is None or not len(out):
+            continue
+        other_out = handlers[other].aggregate(game_map, role, aggregation)[metric]
+        if aggregation.kind == 'patch':
+            others[other] = other_out[other_out.index.isin(out.index)]
+        else:
+            others[other] = other_out[(other_out.index >= out.index[0]) & (other_out.index <= out.index[-1])]
+
+    def thin(out):
+        if len(out) > MAX_POINTS:
+            out = out.iloc[downsample(np.arange(len(out)), out['median'], MAX_POINTS, 'lttb')]
+        x = [overTimeLabel(label) for label in out.index] if aggregation.kind == 'patch' else out.index
+        return x, out
+    x, out = thin(out)
+
+    import plotly.graph_objects as go # Slow to import - see constructValueLineChart
+    spec = METRICS_BY_NAME[metric]
+    fig = go.Figure()
+    fig.add_scatter(x=x, y=out['p75'], mode='lines', line_width=0, hoverinfo='skip', showlegend=False)
+    fig.add_scatter(
+        x=x, y=out['p25'], mode='lines', line_width=0, name='25th - 75th percentile',
+        fill='tonexty', fillcolor='rgba(255, 255, 255, 0.15)',
+    )
+    fig.add_scatter(x=x, y=out['median'], mode='lines+markers', line_color='white', name='Median')
+    fig.add_scatter(x=x, y=out['mean'], mode='lines', line_dash='dot', name='Mean')
+    for other, other_out in others.items():
+        other_x, other_out = thin(other_out)
+        fig.add_scatter(x=other_x, y=other_out['median'], mode='lines+markers', name=f'Median ({other})')
+    if spec.challenger is not None:
+        fig.add_hline(spec.challenger, line_color='yellow')
+    if spec.silver is not None:
+        fig.add_hline(spec.silver, line_color='silver')
+    if spec.y_range is not None:
+        fig.update_layout(yaxis_range=spec.y_range)
+    return fig.update_layout(
+        title=spec.title,
+        yaxis_title=spec.axis,
+        template='plotly_dark',
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+        height=400,
+        margin=dict(l=0, r=0, t=75, b=0),
+    )
+
+
+@app.callback(
+    Output('groups-graph', 'figure'),
+    Input('groups-metric', 'value'),
+    Input('groups-grouping', 'value'),
+    Input('groups-method', 'value'),
+    State('account-select', 'value'),
+    State('map-tabs', 'active_tab'),
+    State('role-select', 'value'),
+)
+def drawGroups(metric, grouping, method, account, game_map, role):
+    dh = handlers[account]
+    if dh.snapshot is None:
+        raise PreventUpdate
+    role = partitionRole(game_map, role)
+    intervals = dh.intervals(game_map, role, metric, grouping, method)
+    intervals = intervals[intervals['games'] >= GROUP_MIN_GAMES].iloc[::-1] # Best on top
+
+    import plotly.graph_objects as go # Slow to import - see constructValueLineChart
+    spec = METRICS_BY_NAME[metric]
+    fig = go.Figure()
+    fig.add_scatter(
+        x=intervals['mean'],
+        y=[str(group) for group in intervals.index],
+        mode='markers',
+        error_x=dict(
+            type='data',
+            array=intervals['upper'] - intervals['mean'],
+            arrayminus=intervals['mean'] - intervals['lower'],
+        ),
+        customdata=intervals['games'],
+        hovertemplate='%{y}: %{x:.2f} (%{customdata} games)<extra></extra>',
+        marker_color='white',
+        showlegend=False,
+    )
+    if spec.challenger is not None:
+        fig.add_vline(spec.challenger, line_color='yellow')
+    if spec.silver is not None:
+        fig.add_vline(spec.silver, line_color='silver')
+    return fig.update_layout(
+        title=f'{spec.title} by {GROUPING_LABELS[grouping]}',
+        xaxis_title=spec.axis,
+        template='plotly_dark',
+        plot_bgcolor='rgba(0, 0, 0, 0)',
+        paper_bgcolor='rgba(0, 0, 0, 0)',
+        height=max(300, 25 * len(intervals) + 100),
+        margin=dict(l=0, r=0, t=75, b=0),
+    )
+
+
+@app.callback(
+    Output('matchups-table', 'children'),
+    Input('matchups-kind', 'value'),
+    State('account-select', 'value'),
+    State('map-tabs', 'active_tab'),
+    State('role-select', 'value'),
+)
+def drawMatchups(kind, account, game_map, role):
+    # A lookup in the snapshot's matchup index plus one groupby - no match files are read
+    dh = handlers[account]
+    if dh.snapshot is None or dh.snapshot.matchups is None:
+        raise PreventUpdate
+    stats = dh.matchupStats(game_map, partitionRole(game_map, role), kind, MATCHUP_METRICS, MATCHUP_MIN_GAMES)
+    if not len(stats):
+        return drawText('Not enough games')
+    if kind == 'duo':
+        # Keyed by puuid - show which tracked account it is
+        stats = stats.rename(index={puuid: account for account, puuid in ACCOUNTS.items()})
+    table = stats.round(1).reset_index(names=MATCHUP_KIND_LABELS[kind])
+    table.columns = [table.columns[0], 'Games'] + [METRICS_BY_NAME[metric].axis for metric in MATCHUP_METRICS]
+    return dbc.Table.from_dataframe(table, striped=True, bordered=False, hover=True, color='dark', size='sm')
+
+
+def partitionRole(game_map, role):
+    # Roles don't mean anything on Howling Abyss
+    if game_map == 'howling_abyss' or role == ALL_ROLES:
+        return None
+    return role
+
+
 # Run app
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,53 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from termcolor import cprint
+
+sys.path.insert(0, '.')
+from src.bootstrap import groupIntervals
+
+# Compares a per-group Python bootstrap against src.bootstrap.groupIntervals
+# Usage: python benchmarks/bench_bootstrap.py [n_games ...]
+# Games are spread over 60 champions, 2000 resamples each
+
+
+N_GROUPS = 60
+N_RESAMPLES = 2000
+
+
+def makeGames(n):
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.normal(3, 1.5, n))
+    values[::40] = np.nan
+    groups = pd.Series(rng.integers(0, N_GROUPS, n)).astype('category')
+    return values, groups
+
+
+def naiveIntervals(values, groups):
+    rng = np.random.default_rng(0)
+    out = {}
+    for group, x in values.groupby(groups):
+        x = x.dropna().to_numpy()
+        means = [rng.choice(x, len(x)).mean() for _ in range(N_RESAMPLES)]
+        out[group] = np.quantile(means, [0.025, 0.975])
+    return out
+
+
+def timeIt(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 50_000]
+
+    cprint(f'{"games":>10} {"naive (s)":>12} {"bootstrap (s)":>14} {"analytic (s)":>13}', 'green')
+    for n in sizes:
+        values, groups = makeGames(n)
+        naive = timeIt(lambda: naiveIntervals(values, groups))
+        batched = timeIt(lambda: groupIntervals(values, groups, n_resamples=N_RESAMPLES))
+        analytic = timeIt(lambda: groupIntervals(values, groups, method='analytic'))
+        print(f'{n:>10,} {naive:>12.4f} {batched:>14.4f} {analytic:>13.4f}')
@@ -0,0 +1,72 @@
+import json
+import random
+import sys
+import time
+
+from termcolor import cprint
+
+sys.path.insert(0, '.')
+from src import schema
+from src.extract import extractMatchRow
+
+# Summary decode + row extraction throughput, in matches per second
+# Usage: python benchmarks/bench_decode.py [n_matches]
+# Summaries are synthetic but shaped like match-v5 (~100 keys per participant)
+
+
+def makeSummary(rng, puuid):
+    puuids = [puuid] + [f'puuid-{rng.randrange(10**9)}' for _ in range(9)]
+    rng.shuffle(puuids)
+    participants = []
+    for i in range(10):
+        participant = {f'stat{k}': rng.randint(0, 10_000) for k in range(85)}
+        participant.update({
+            'puuid': puuids[i],
+            'participantId': i + 1,
+            'teamId': 100 if i < 5 else 200,
+            'role': ['SOLO', 'NONE', 'SOLO', 'CARRY', 'SUPPORT'][i % 5],
+            'lane': ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'BOTTOM'][i % 5],
+            'championName': rng.choice(['Jinx', 'Ashe', 'Lulu', 'Ahri']),
+            'perks': {'styles': [{'selections': [{'perk': 8005, 'var1': 1}] * 4}] * 2},
+        })
+        for field in schema.PARTICIPANT_FIELDS:
+            participant.setdefault(field, rng.randint(0, 30_000))
+        participants.append(participant)
+
+    return json.dumps({
+        'metadata': {'matchId': 'NA1_1', 'participants': puuids, 'dataVersion': '2'},
+        'info': {
+            'queueId': 420,
+            'gameStartTimestamp': 1_640_995_200_000,
+            'gameDuration': 1800,
+            'gameVersion': '12.1.1',
+            'participants': participants,
+            'teams': [{'teamId': 100, 'objectives': {'baron': {'first': True, 'kills': 1}}}] * 2,
+        },
+    }).encode()
+
+
+# Timeline reading isn't measured here
+_timeline_frames = {15: {str(i): {'totalGold': 5000, 'minionsKilled': 100} for i in range(11)}}
+
+
+def bench(name, decode, raws, puuid):
+    start = time.perf_counter()
+    for raw in raws:
+        extractMatchRow(decode(raw), _timeline_frames, puuid, 'summoners_rift')
+    elapsed = time.perf_counter() - start
+    print(f'{name:>10} {len(raws) / elapsed:>14,.0f}')
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    rng = random.Random(0)
+    puuid = 'tracked-puuid'
+    raws = [makeSummary(rng, puuid) for _ in range(n)]
+
+    cprint(f'{"decoder":>10} {"matches/s":>14}', 'green')
+    bench('json', json.loads, raws, puuid)
+    if schema.orjson is not None:
+        bench('orjson', schema.orjson.loads, raws, puuid)
+    if schema._decoder is not None:
+        bench('msgspec', schema._decoder.decode, raws, puuid)
@@ -0,0 +1,73 @@
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from termcolor import cprint
+
+sys.path.insert(0, '.')
+from src.extract import ROW_COLUMNS, ROW_DTYPES
+from src.frame import RowAccumulator
+
+# Compares the old per-row df.loc inserts against RowAccumulator when building the match frame
+# Usage: python benchmarks/bench_load.py [n_matches ...]
+# Rows are synthetic so only frame construction is measured, not JSON parsing
+
+
+def randomValue(rng, dtype):
+    # Something that fits the column's dtype (see ROW_DTYPES)
+    if dtype == 'bool':
+        return rng.random() < 0.5
+    if dtype == 'category':
+        return 'UNKNOWN'
+    return rng.randint(0, min(20_000, np.iinfo(dtype.lower()).max))
+
+
+def makeRows(n):
+    rng = random.Random(0)
+    champions = ['Jinx', 'Ashe', 'Caitlyn', 'Ezreal', 'Kai\'Sa', 'Xayah']
+    rows = []
+    for i in range(n):
+        row = {col: randomValue(rng, ROW_DTYPES[col]) for col in ROW_COLUMNS}
+        row['start_ts'] = 1_640_995_200_000 + i * 3_600_000
+        row['patch'] = '12.1'
+        row['champion'] = rng.choice(champions)
+        row['lane'] = 'BOTTOM'
+        row['role'] = 'CARRY'
+        if i % 10 == 0:
+            row['gd15'] = None
+            row['csdiff15'] = None
+        rows.append((f'NA1_{4_000_000_000 + i}', row))
+    return rows
+
+
+def buildWithLoc(rows):
+    df = pd.DataFrame(columns=ROW_COLUMNS)
+    for index, row in rows:
+        df.loc[index] = [row[col] for col in ROW_COLUMNS]
+    return df
+
+
+def buildWithAccumulator(rows):
+    acc = RowAccumulator(ROW_DTYPES)
+    for index, row in rows:
+        acc.append(index, row)
+    return acc.toFrame()
+
+
+def timeIt(func, rows):
+    start = time.perf_counter()
+    func(rows)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 50_000]
+
+    cprint(f'{"matches":>10} {"df.loc (s)":>12} {"accumulator (s)":>16} {"speedup":>9}', 'green')
+    for n in sizes:
+        rows = makeRows(n)
+        loc_time = timeIt(buildWithLoc, rows)
+        acc_time = timeIt(buildWithAccumulator, rows)
+        print(f'{n:>10} {loc_time:>12.3f} {acc_time:>16.3f} {loc_time / acc_time:>8.0f}x')
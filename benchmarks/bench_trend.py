@@ -0,0 +1,61 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from termcolor import cprint
+
+sys.path.insert(0, '.')
+from src.trend import TRENDLINES
+
+# Compares plotly's trendline='lowess' (what app.py used) against the src.trend engines
+# Usage: python benchmarks/bench_trend.py [n_games ...]
+# Times the trendline only - plotly's is the difference between a scatter with and without it
+
+
+def makeGames(n):
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype=np.float64)
+    y = 7 + np.sin(x / n * 6) + rng.normal(0, 1.5, n)
+    y[::40] = np.nan # eg. games without a lane opponent
+    return pd.DataFrame({'game_index': x, 'value': y})
+
+
+def timeIt(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def plotlyLowess(df):
+    with_trend = timeIt(lambda: px.scatter(df, x='game_index', y='value', trendline='lowess', trendline_options={'frac': 0.1}))
+    without_trend = timeIt(lambda: px.scatter(df, x='game_index', y='value'))
+    return with_trend - without_trend
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    engines = list(TRENDLINES)
+    plotlyLowess(makeGames(100)) # First use imports statsmodels
+
+    cprint(f'{"games":>10} {"plotly lowess (s)":>18}' + ''.join(f' {name + " (s)":>12}' for name in engines), 'green')
+    for n in sizes:
+        df = makeGames(n)
+        times = [plotlyLowess(df)]
+        for name in engines:
+            engine = TRENDLINES[name]()
+            times.append(timeIt(lambda: engine.fit(df['game_index'], df['value'])))
+        print(f'{n:>10,} {times[0]:>18.4f}' + ''.join(f' {t:>12.4f}' for t in times[1:]))
+
+    # Appending 1% more games to an existing fit
+    cprint(f'\n{"games":>10} {"+1% games":>10}' + ''.join(f' {name + " (s)":>12}' for name in engines), 'green')
+    for n in sizes:
+        df = makeGames(n + n // 100)
+        old = df.iloc[:n]
+        times = []
+        for name in engines:
+            engine = TRENDLINES[name]()
+            trend = engine.fit(old['game_index'], old['value'])
+            times.append(timeIt(lambda: engine.extend(trend, df['game_index'], df['value'])))
+        print(f'{n:>10,} {n // 100:>10,}' + ''.join(f' {t:>12.4f}' for t in times))
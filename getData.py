@@ -1,22 +1,43 @@
-import json
-import os
+import threading
+import time
 from collections import defaultdict
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 import pendulum
 from termcolor import colored, cprint
 
+from src.accounts import MAIN_ACCOUNT, trackedAccounts
 from src.api import RiotDataHandler
+from src.catalog import MatchCatalog
+from src.checkpoint import CrawlCheckpoint
+from src.pipeline import WritePipeline
+from src.storage import getStorage
 
 # Run API to get historical data
 
+# Nothing before this is fetched
+HISTORY_START = pendulum.datetime(year=2022, month=1, day=1)
+
+# How many times the historical crawl retries a failed request
+MAX_RETRIES = 5
+
+# How far behind the time a sync started its upper mark is kept - a game shows up in match history only
+#   after it ends (plus Riot's ingestion delay), so one that started just before the sync may not be
+#   listed yet. The next sync requests this margin again and skips the matches it already has.
+SYNC_LAG = 3 * 3600
 
 
 class UserDataInterface:
+    # Fetches the matches of one account - puuid=None is the main account in data/private.yaml
+    # Pass shared (the main account's interface) to fetch another account alongside it: both then use
+    #   the same API session and rate limiter, catalog, write pipeline and record of what is stored, and
+    #   claim each match before fetching it, so a duo game is fetched and stored once
 
 
-    def __init__(self):
-        self._rd = RiotDataHandler()
+    def __init__(self, puuid=None, shared=None):
+        self._account = puuid # None for the main account - see _checkpointPath, MatchCatalog.syncWindow
+        self._shared = shared
+        self._rd = RiotDataHandler(puuid=puuid, api_handler=shared._rd.apiHandler if shared is not None else None)
         self._queueIdToMap = { # Modified from https://static.developer.riotgames.com/docs/lol/queues.json
             400: 'summoners_rift', # draft
             420: 'summoners_rift', # ranked
@@ -27,58 +48,294 @@ class UserDataInterface:
         }
         self._known_game_maps = set(self._queueIdToMap.values())
         self._doHaveData = None
+        self._ignored = None
+        self._failedMatches = {} # match_id: status of requests that didn't return 200
+        if shared is None:
+            self._storage = getStorage()
+            self._catalog = MatchCatalog(storage=self._storage)
+            self._claimed = set() # Matches some account is fetching right now, see _claim
+            self._lock = threading.Lock() # Guards _claimed and _live_pipeline
+            self._stop = threading.Event() # Set on Ctrl-C, see run
+            self._live_pipeline = None # See pollRecent
+        else:
+            self._storage = shared._storage
+            self._catalog = shared._catalog
+            self._claimed = shared._claimed
+            self._lock = shared._lock
+            self._stop = shared._stop
+        self._pipeline = None
+
+
+    def forAccounts(self):
+        # This interface plus one sharing it for every other tracked account (see src.accounts)
+        return [self] + [
+            UserDataInterface(puuid, shared=self)
+            for label, puuid in trackedAccounts().items() if label != MAIN_ACCOUNT
+        ]
 
 
     def run(self):
         range_selection = self.getUserParams()
-        self._constructDoHaveData()
+        if range_selection == 4:
+            self._catalog.rebuild()
+            return
+        accounts = self.forAccounts()
+        for account in accounts:
+            account._constructDoHaveData()
 
+        # Writes happen on background threads while the next requests are in flight
+        # Every account is fetched at once, as fast as the shared rate limiter allows
+        with WritePipeline(self._storage, self._catalog) as pipeline:
+            for account in accounts:
+                account._pipeline = pipeline
+            if len(accounts) == 1:
+                self._runSelection(range_selection)
+            else:
+                with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+                    futures = [executor.submit(account._runSelection, range_selection) for account in accounts]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except KeyboardInterrupt:
+                        # Only this thread gets Ctrl-C - every account stops at its next check (see _checkStop)
+                        #   and saves its progress, which the executor waits for
+                        cprint('Interrupted - waiting for every account to save its progress', 'yellow')
+                        self._stop.set()
+
+
+    def _runSelection(self, range_selection):
         if range_selection == 1:
             status, match_list = self._rd.getMatchHistory() # Defaults to now minus 2 days
             if status == 200:
                 self._getDataFromMatchList(match_list)
 
         elif range_selection == 2:
-            # Go back to Jan 1st 2022
-            tooOld = False
-            start_idx = 0
-            nonzero_status = []
+            self._historicalCrawl()
+
+        elif range_selection == 3:
+            self._incrementalSync()
+
+
+    def pollRecent(self):
+        # Non-interactive version of option 1, for the dashboard's live mode (see src.live)
+        # Returns {game_map: [match_id]} of every stored match in the account's recent history, fetching
+        #   the ones that aren't stored yet - including those another account's poll stored, eg. duo games
+        # AppDataHandler.appendMatches skips whatever is already loaded
+        if self._doHaveData is None:
+            self._constructDoHaveData()
+
+        status, match_list = self._rd.getMatchHistory(start_date=pendulum.now() - pendulum.duration(days=2))
+        if status != 200:
+            cprint(f'Polling match history failed ({status})', 'yellow')
+            return {}
+        new_matches = [match for match in match_list if not self._isKnown(match)]
+        if new_matches:
+            self._failedMatches.clear()
+            self._pipeline = self._livePipeline()
+            self._getDataFromMatchList(new_matches)
+            self._pipeline.flush()
+
+        stored = defaultdict(list)
+        for match in match_list:
+            if all(self._doHaveData[match]):
+                stored[self._catalog.mapOf(match)].append(match)
+        return dict(stored)
+
+
+    def _livePipeline(self):
+        # One write pipeline for every account's polls, running for as long as the dashboard does
+        owner = self._shared if self._shared is not None else self
+        with self._lock:
+            if owner._live_pipeline is None:
+                owner._live_pipeline = WritePipeline(self._storage, self._catalog)
+                owner._live_pipeline.start()
+            return owner._live_pipeline
+
+
+    def _historicalCrawl(self):
+        # Go back to Jan 1st 2022
+        # Progress is checkpointed after every page, so an interrupted crawl resumes where it stopped
+        checkpoint = CrawlCheckpoint(self._checkpointPath())
+        if checkpoint.is_resumed:
+            cprint(f'Resuming crawl at match {checkpoint.start_idx} ({len(checkpoint.failed)} failed matches)', 'green')
+
+        tooOld = False
+        list_failures = 0
+        try:
             while not tooOld:
-                status, match_list = self._rd.getMatchHistory(
-                    start_date = None,
-                    start_idx = start_idx,
-                    max_games = 100
-                )
-                if status == 200:
-                    tooOld = self._getDataFromMatchList(match_list)
-                    start_idx += 100
-                else:
-                    nonzero_status.append(status)
-                    if len(nonzero_status) >= 3:
-                        print(nonzero_status)
-                        break
+                self._checkStop()
+                if not checkpoint.pending:
+                    status, match_list = self._rd.getMatchHistory(
+                        start_date = None,
+                        start_idx = checkpoint.start_idx,
+                        max_games = 100
+                    )
+                    if status != 200:
+                        list_failures += 1
+                        if list_failures > MAX_RETRIES:
+                            cprint(f'Giving up on match list after {list_failures} failures ({status})', 'red')
+                            return
+                        self._backoff(list_failures)
+                        continue
+                    list_failures = 0
+
+                    if not match_list:
+                        break # Reached the start of match history
+                    checkpoint.pending = match_list
+                    checkpoint.save()
+
+                self._failedMatches.clear()
+                tooOld = self._getDataFromMatchList(checkpoint.pending)
+                self._checkStop() # The page may be incomplete - keep it pending
+                checkpoint.recordFailures(self._failedMatches)
+                checkpoint.pending = []
+                checkpoint.start_idx += 100
+                checkpoint.save()
+
+            self._retryFailed(checkpoint)
+
+        except KeyboardInterrupt:
+            checkpoint.save()
+            cprint('Interrupted - run again to resume', 'yellow')
+            return
+
+        if checkpoint.failed:
+            cprint(f'Crawl finished, could not get: {checkpoint.failed}', 'yellow')
+        else:
+            cprint('Crawl finished', 'green')
+        checkpoint.clear()
+
+
+    def _retryFailed(self, checkpoint):
+        attempt = 1
+        while True:
+            to_retry = checkpoint.retryable(MAX_RETRIES)
+            if not to_retry:
+                return
+
+            self._backoff(attempt)
+            self._checkStop()
+            cprint(f'Retrying {len(to_retry)} failed matches', 'green')
+            self._failedMatches.clear()
+            self._getDataFromMatchList(to_retry)
+            self._checkStop()
+            checkpoint.recordSuccess([match for match in to_retry if match not in self._failedMatches])
+            checkpoint.recordFailures(self._failedMatches)
+            checkpoint.save()
+            attempt += 1
+
+
+    def _checkpointPath(self):
+        if self._account is None:
+            return 'data/crawl_checkpoint.json'
+        return f'data/crawl_checkpoint_{self._account[:12]}.json'
+
+
+    def _checkStop(self):
+        # Ctrl-C while several accounts are fetched is only seen by the main thread (see run) - this
+        #   unwinds an account's thread the same way, so the handlers that save progress run
+        if self._stop.is_set():
+            raise KeyboardInterrupt
+
+
+    @staticmethod
+    def _backoff(attempt):
+        delay = min(2 ** attempt, 120)
+        cprint(f'Waiting {delay}s before retrying', 'yellow')
+        time.sleep(delay)
+
+
+    def _incrementalSync(self):
+        # Only request the time windows that haven't been synced yet
+        # The catalog keeps (oldest, newest): every match between the two has been synced
+        synced_until = int(pendulum.now().timestamp()) - SYNC_LAG
+        history_start = int(HISTORY_START.timestamp())
+        self._failedMatches.clear()
+
+        window = self._catalog.syncWindow(self._account)
+        if window is None:
+            # First sync - backfill everything, newest first
+            self._syncWindow(history_start, None, newest=synced_until)
+        else:
+            oldest, newest = window
+            if self._syncWindow(newest, None):
+                self._catalog.setSyncWindow(oldest, max(newest, synced_until), self._account)
+            if oldest > history_start:
+                # A previous backfill stopped early - carry on from where it got to
+                self._syncWindow(history_start, oldest, newest=self._catalog.syncWindow(self._account)[1])
+
+        if self._retryableFailures():
+            cprint(f'Sync incomplete, failed: {self._failedMatches}', 'yellow')
+        else:
+            cprint(f'Synced up to {pendulum.from_timestamp(self._catalog.syncWindow(self._account)[1])}', 'green')
+
+
+    def _syncWindow(self, start_ts, end_ts, newest=None):
+        # Pages through matches in [start_ts, end_ts] (epoch seconds, end None = now), newest first
+        # Returns True if the whole window was synced
+        # If newest is given, each fully synced page also moves the sync window's lower mark down to it,
+        #   so an interrupted backfill picks up where it stopped
+        start_idx = 0
+        while True:
+            if self._stop.is_set():
+                return False
+            status, match_list = self._rd.getMatchHistory(
+                start_date = pendulum.from_timestamp(start_ts),
+                end_date = None if end_ts is None else pendulum.from_timestamp(end_ts),
+                start_idx = start_idx,
+                max_games = 100,
+            )
+            if status != 200:
+                return False
+
+            if all(self._isKnown(match) for match in match_list):
+                # Everything past here was synced before
+                done = True
+            else:
+                failed_before = self._retryableFailures()
+                self._getDataFromMatchList(match_list)
+                if self._stop.is_set() or self._retryableFailures() > failed_before:
+                    # Can't move the sync window past a match we don't have yet (or one left for an interrupt)
+                    return False
+                done = len(match_list) < 100
+
+            if newest is not None:
+                lower = start_ts if done else self._catalog.oldestStart(match_list)
+                if lower is not None:
+                    self._catalog.setSyncWindow(lower, newest, self._account)
+
+            if done:
+                return True
+            start_idx += 100
+
+
+    def _retryableFailures(self):
+        # 404s are permanent (Riot doesn't keep every timeline), anything else might work next time
+        return sum(1 for status in self._failedMatches.values() if status != 404)
+
+
+    def _isKnown(self, match):
+        return all(self._doHaveData[match]) or match in self._ignored
 
     
     def _constructDoHaveData(self):
         # Construct dict "doHaveData", which does game_id: [summary_bool, timeline_bool]
+        if self._shared is not None:
+            # One record of what is stored for every account
+            if self._shared._doHaveData is None:
+                self._shared._constructDoHaveData()
+            self._doHaveData = self._shared._doHaveData
+            self._ignored = self._shared._ignored
+            return
+
+        if self._catalog.is_new:
+            # First run with a catalog - index whatever is already on disk
+            self._catalog.rebuild()
+
         doHaveData = defaultdict(lambda: [False, False]) # Default is that no data is stored
-        for game_map in self._known_game_maps:
-            base_dir = Path('data/historical') / f'{game_map}'
-            summary_dir = base_dir / 'summary'
-            timeline_dir = base_dir / 'timeline'
-
-            os.makedirs(summary_dir, exist_ok=True)
-            os.makedirs(timeline_dir, exist_ok=True)
-
-            existing_summary_ids = {x[:-5] for x in os.listdir(summary_dir)}
-            existing_timeline_ids = {x[:-5] for x in os.listdir(timeline_dir)}
-
-            for game_id in existing_summary_ids:
-                doHaveData[game_id][0] = True
-            for game_id in existing_timeline_ids:
-                doHaveData[game_id][1] = True
-        
+        doHaveData.update(self._catalog.doHaveData())
         self._doHaveData = doHaveData
+        self._ignored = self._catalog.ignoredIds()
 
 
     def getUserParams(self):
@@ -86,6 +343,8 @@ class UserDataInterface:
         cprint('\n'.join([
             '1. Update recent games (last 50 games)',
             '2. Gather historical data (iterates back to Jan 1st 2022)',
+            '3. Incremental sync (only requests games newer/older than what was synced before)',
+            '4. Rebuild match catalog from stored files',
             '',
         ]), 'green')
         range_selection = input(colored('> '))
@@ -97,54 +356,87 @@ class UserDataInterface:
     def _getDataFromMatchList(self, match_list):
         # Return value is True if too old, False if not
         # "too old" is defined as pre 2022/01/01
+        # Matches another account is fetching at the same time are left to it - if it fails to get one,
+        #   that account records the failure and retries it
+        claimed = self._claim(match_list)
+        try:
+            return self._fetchMatches(claimed)
+        finally:
+            with self._lock:
+                self._claimed.difference_update(claimed)
+
+
+    def _claim(self, match_list):
+        # The matches of match_list no other account is fetching, now marked as fetched by this one
+        with self._lock:
+            claimed = [match for match in match_list if match not in self._claimed]
+            self._claimed.update(claimed)
+        return claimed
+
+
+    def _fetchMatches(self, match_list):
+        # Summaries for the whole page are fetched concurrently, then timelines for the whole page
+        # Stops early, leaving the rest unfetched, once a Ctrl-C is being handled (see _checkStop)
 
+        tooOld = False
+        match_maps = {} # Maps of summaries submitted here - they may not be in the catalog yet
+
+        to_fetch = [match for match in match_list if not self._doHaveData[match][0] and match not in self._ignored]
+        summaries = self._pipeline.fetched(self._rd.getMatchDataBatch(to_fetch))
+        for match, (match_status, md) in zip(to_fetch, summaries):
+            if self._stop.is_set():
+                return tooOld
+            if match_status != 200:
+                self._failedMatches[match] = match_status
+            else:
+                match_queue_id = md['info']['queueId']
+                if match_queue_id not in self._queueIdToMap:
+                    # Unrecognized mode - ignore (prob a special game mode)
+                    cprint(f'Ignoring unrecognized gamemode: {match_queue_id}', 'yellow')
+                    self._catalog.recordIgnored(match, match_queue_id)
+                    self._ignored.add(match)
+                    continue
+
+                match_date = pendulum.from_timestamp(md['info']['gameStartTimestamp'] // 1000)
+                if match_date < HISTORY_START:
+                    cprint(f'Found too old match: {match_date}', 'green')
+                    tooOld = True
+                    break
+
+                match_map = self._queueIdToMap[match_queue_id]
+                cprint(f'Writing summary data to file!', 'green')
+                self._pipeline.submit(match_map, 'summary', match, md)
+                self._doHaveData[match][0] = True
+                match_maps[match] = match_map
+
+        # Map data is not in timeline status - need to look at match summary
+        to_fetch = []
         for match in match_list:
             summaryCached, timelineCached = self._doHaveData[match]
-
+            if timelineCached or match in self._ignored:
+                continue
             if not summaryCached:
-                match_status, md = self._rd.getMatchData(match)
-                if match_status == 200:
-                    match_queue_id = md['info']['queueId']
-                    if match_queue_id not in self._queueIdToMap:
-                        # Unrecognized mode - ignore (prob a special game mode)
-                        cprint(f'Ignoring unrecognized gamemode: {match_queue_id}', 'yellow')
-                        continue
+                cprint(f'Missing data! No summary for {match}', 'red')
+                continue
+            to_fetch.append(match)
+
+        timelines = self._pipeline.fetched(self._rd.getTimelineDataBatch(to_fetch))
+        for match, (timeline_status, td) in zip(to_fetch, timelines):
+            if self._stop.is_set():
+                return tooOld
+            if timeline_status != 200:
+                self._failedMatches[match] = timeline_status
+            else:
+                game_map = match_maps.get(match) or self._catalog.mapOf(match)
+                if game_map is None:
+                    raise RuntimeError('doHaveData contains false info about which data is available :(')
 
-                    match_date = pendulum.from_timestamp(md['info']['gameStartTimestamp'] // 1000)
-                    if match_date < pendulum.datetime(year=2022, month=1, day=1):
-                        cprint(f'Found too old match: {match_date}', 'green')
-                        return True
-
-                    match_map = self._queueIdToMap[match_queue_id]
-                    cprint(f'Writing summary data to file!', 'green')
-                    with open(f'data/historical/{match_map}/summary/{match}.json', 'w') as f:
-                        json.dump(md, f)
-                    self._doHaveData[match][0] = True
-            
-            if not timelineCached:
-                timeline_status, td = self._rd.getTimelineData(match)
-                if timeline_status == 200:
-                    # Map data is not in timeline status - need to look at match summary
-                    if not self._doHaveData[match][0]:
-                        cprint(f'Missing data! No summary for {match}', 'red')
-                    else:
-                        for game_map in self._known_game_maps:
-                            base_dir = Path('data/historical') / f'{game_map}'
-                            summary_dir = base_dir / 'summary'
-                            existing_summary_ids = {x[:-5] for x in os.listdir(summary_dir)}
-                            if match in existing_summary_ids:
-                                break
-                        else:
-                            raise RuntimeError('doHaveData contains false info about which data is available :(')
-
-                        # Now we know the game_map, so store timeline in same spot
-                        cprint(f'Writing timeline data to file!', 'green')
-                        with open(f'data/historical/{game_map}/timeline/{match}.json', 'w') as f:
-                            json.dump(td, f)
-                        self._doHaveData[match][1] = True
-        
-        return False
+                # Now we know the game_map, so store timeline in same spot
+                cprint(f'Writing timeline data to file!', 'green')
+                self._pipeline.submit(game_map, 'timeline', match, td)
+                self._doHaveData[match][1] = True
 
+        return tooOld
 
 
 if __name__ == '__main__':
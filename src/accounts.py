@@ -0,0 +1,22 @@
+import yaml
+
+
+# Accounts to track, from data/private.yaml:
+#   puuid: <main account>
+#   accounts:            # Optional, more accounts - label: puuid
+#     duo: <puuid>
+# Matches are stored once however many tracked accounts played in them (storage is keyed by match ID,
+#   the catalog's match_players by participant), everything derived from them is per account.
+
+MAIN_ACCOUNT = 'main'
+
+
+def trackedAccounts(path='data/private.yaml'):
+    # {label: puuid}, the main account first
+    with open(path, 'r') as f:
+        private_data = yaml.safe_load(f)
+    accounts = {MAIN_ACCOUNT: private_data['puuid']}
+    for label, puuid in (private_data.get('accounts') or {}).items():
+        if puuid not in accounts.values():
+            accounts[str(label)] = puuid
+    return accounts
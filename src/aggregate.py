@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pendulum
+
+from src.lru import VersionedCache
+from src.metrics import METRICS
+
+
+# Stats over time for the metrics of src.metrics ("like all in-client ranked stats")
+# An Aggregation either buckets games (daily, weekly, patch) or rolls a window over them (the last
+#   `size` games, or the last `size` days, as of each game). Either way the result has one row per
+#   bucket/game and a (metric, stat) column for every metric and STATS entry.
+# Bucket rows are labelled by the day/week start or patch, window rows by the game's start time - all
+#   times are naive local time, so days and weeks line up with the player's calendar.
+
+Aggregation = namedtuple('Aggregation', ['kind', 'size'], defaults=[None])
+
+BUCKET_KINDS = ('daily', 'weekly', 'patch')
+WINDOW_KINDS = ('games', 'days')
+
+PERCENTILES = (10, 25, 75, 90)
+STATS = ('mean', 'median', *(f'p{p}' for p in PERCENTILES), 'count')
+
+LOCAL_TZ = pendulum.local_timezone().name
+
+
+def gameTimes(df):
+    # start_ts of a partition as naive local datetimes
+    times = pd.to_datetime(df['start_ts'].to_numpy(), unit='ms', utc=True)
+    return times.tz_convert(LOCAL_TZ).tz_localize(None)
+
+
+def bucketKeys(df, kind):
+    # Bucket label of every game of a partition
+    if kind == 'patch':
+        return pd.Index(df['patch'].astype('object'))
+    days = gameTimes(df).normalize()
+    if kind == 'daily':
+        return days
+    if kind == 'weekly':
+        return days - pd.to_timedelta(days.dayofweek, unit='D') # Weeks start on Monday
+    raise ValueError(f'Unknown bucket kind {kind}')
+
+
+def _stats(grouped):
+    # grouped is a groupby/rolling object over the metric columns
+    stats = {
+        'mean': grouped.mean(),
+        'median': grouped.median(),
+        **{f'p{p}': grouped.quantile(p / 100) for p in PERCENTILES},
+        'count': grouped.count(),
+    }
+    out = pd.concat(stats, axis=1).swaplevel(axis=1)
+    return out[[(metric.name, stat) for metric in METRICS for stat in STATS]]
+
+
+def aggregate(metrics_df, df, spec, rows=None):
+    # metrics_df is AppDataHandler.metrics of the partition df
+    # rows limits a window aggregation to the games at those positions (earlier games still count
+    #   towards their windows) - see AggregateCache
+    values = metrics_df[[metric.name for metric in METRICS]]
+    if spec.kind in BUCKET_KINDS:
+        keys = bucketKeys(df, spec.kind)
+        out = _stats(values.groupby(keys.to_numpy(), sort=False))
+        return out.reindex(_bucketOrder(keys, spec.kind))
+
+    start = 0 if rows is None else rows.start
+    if spec.kind == 'games':
+        start = max(0, start - spec.size + 1)
+        windows = values.iloc[start:].rolling(spec.size, min_periods=1)
+    elif spec.kind == 'days':
+        times = gameTimes(df)
+        if rows is not None and rows.start:
+            # Windows are (t - size days, t], so earlier games within that reach are needed too
+            start = int(np.searchsorted(times, times[rows.start] - pd.Timedelta(days=spec.size), side='right'))
+        windows = values.iloc[start:].set_axis(times[start:]).rolling(f'{spec.size}D')
+    else:
+        raise ValueError(f'Unknown aggregation kind {spec.kind}')
+
+    out = _stats(windows)
+    out.index = gameTimes(df.iloc[start:])
+    if rows is not None:
+        out = out.iloc[rows.start - start:]
+    return out
+
+
+def _bucketOrder(keys, kind):
+    # Calendar buckets in time order, patches in the order they were first played
+    unique = keys.unique()
+    return unique if kind == 'patch' else unique.sort_values()
+
+
+class AggregateCache:
+    # Aggregations per (dataset version, partition key, Aggregation), for the newest few versions
+    # When a snapshot was appended onto a cached one (see AppDataHandler.appendMatches), buckets only
+    #   get recomputed if a new game falls into them, and windows only for the new games
+
+    def __init__(self, max_versions=2):
+        self._results = VersionedCache(max_versions) # (version, key, spec): (frame, row index of the partition)
+
+
+    def get(self, snapshot, key, spec, metrics_df, df):
+        spec = Aggregation(*spec)
+        cached = self._results.get((snapshot.version, key, spec))
+        base = self._results.get((snapshot.base, key, spec)) if snapshot.base is not None else None
+        if cached is not None:
+            return cached[0]
+
+        if base is not None and len(base[1]) <= len(df) and base[1].equals(df.index[:len(base[1])]):
+            out = self._extend(base[0], len(base[1]), metrics_df, df, spec)
+        else:
+            out = aggregate(metrics_df, df, spec)
+
+        self._results.put((snapshot.version, key, spec), (out, df.index))
+        return out
+
+
+    @staticmethod
+    def _extend(prev, n_prev, metrics_df, df, spec):
+        if n_prev == len(df):
+            return prev
+        if spec.kind in WINDOW_KINDS:
+            return pd.concat([prev, aggregate(metrics_df, df, spec, rows=range(n_prev, len(df)))])
+
+        keys = bucketKeys(df, spec.kind)
+        touched = keys[n_prev:].unique()
+        affected = keys.isin(touched)
+        fresh = aggregate(metrics_df[affected], df[affected], spec)
+        out = pd.concat([prev.drop(index=touched, errors='ignore'), fresh])
+        return out.reindex(_bucketOrder(keys, spec.kind))
@@ -1,18 +1,23 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import pendulum
 import requests
 import yaml
-from ratelimit import limits, sleep_and_retry
+from requests.adapters import HTTPAdapter
+from termcolor import cprint
+
+from src.limiter import RateLimiter
 
 
 # Add more from here: https://developer.riotgames.com/apis
 
-# Singlethreaded for now - throughput is unlikely to be a problem and rate limit is pretty low anyway
 class ApiHandler:
+    # Requests go through one pooled session and a shared RateLimiter, so sendQuery is safe to call
+    #   from several threads at once - sendQueries does exactly that
 
-    def __init__(self):
+    def __init__(self, max_workers=10):
         self.api_key = None
 
         with open('data/private.yaml', 'r') as f:
@@ -21,15 +26,31 @@ class ApiHandler:
         self.standardHeader = {
             'X-Riot-Token': self.api_key
         }
-    
-    @sleep_and_retry
-    @limits(calls=95, period=60*2) # Only really need to worry about this one when singlethreaded
-    def sendQuery(self, url):
-        print(url)
 
-        response = requests.get(url, headers=self.standardHeader)
-        status = response.status_code
-        print(status)
+        self.max_workers = max_workers
+        self.limiter = RateLimiter()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(self.standardHeader)
+
+    def sendQuery(self, url, method=None, max_retries=3):
+        # method is the Riot API method the url belongs to, for per-method rate limits
+        for _ in range(max_retries + 1):
+            self.limiter.acquire(method)
+            print(url)
+
+            response = self.session.get(url)
+            status = response.status_code
+            print(status)
+            self.limiter.updateFromHeaders(method, response.headers)
+
+            if status == 429:
+                retry_after = int(response.headers.get('Retry-After', 1))
+                cprint(f'Rate limited - waiting {retry_after}s', 'yellow')
+                self.limiter.pause(retry_after)
+                continue
+            break
 
         if status == 200:
             res_json = json.loads(response.text)
@@ -38,16 +59,31 @@ class ApiHandler:
             # FIXME: Doing this for now to avoid errors
             return (status, {})
 
+    def sendQueries(self, urls, method=None):
+        # Sends all urls concurrently, as fast as the rate limits allow
+        # Yields (status, json) in the same order as urls, each as soon as it (and those before it) arrive
+        if len(urls) <= 1:
+            yield from (self.sendQuery(url, method) for url in urls)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(lambda url: self.sendQuery(url, method), urls)
+
 
 class RiotDataHandler:
+    # puuid defaults to the main account in data/private.yaml
+    # Pass another handler's apiHandler to share its session and rate limiter - Riot's limits are per
+    #   API key, so every account fetched with the same key has to go through one RateLimiter
 
-    def __init__(self):
-        self.apiHandler = ApiHandler()
+    def __init__(self, puuid=None, api_handler=None):
+        self.apiHandler = api_handler if api_handler is not None else ApiHandler()
         self.standardPrefix = 'https://americas.api.riotgames.com/lol'
 
-        with open('data/private.yaml', 'r') as f:
-            private_data = yaml.safe_load(f)
-        self.puuid = private_data['puuid']
+        if puuid is None:
+            with open('data/private.yaml', 'r') as f:
+                private_data = yaml.safe_load(f)
+            puuid = private_data['puuid']
+        self.puuid = puuid
     
     def getMatchHistory(self,
             start_date = pendulum.now() - pendulum.duration(days=2),
@@ -55,6 +91,7 @@ class RiotDataHandler:
             max_games = 50,
             # type = 'normal', # This prefers to ranked/non-ranked and I mostly won't be using it
             queue = None,
+            end_date = None,
         ):
 
         rq_url = f'{self.standardPrefix}/match/v5/matches/by-puuid/{self.puuid}/ids?'
@@ -67,25 +104,42 @@ class RiotDataHandler:
         if start_date is not None:
             start_timestamp = int(start_date.timestamp())
             args.append(f'startTime={start_timestamp}')
+        if end_date is not None:
+            end_timestamp = int(end_date.timestamp())
+            args.append(f'endTime={end_timestamp}')
         if start_idx is not None:
             args.append(f'start={start_idx}')
 
         args = '&'.join(args)
         rq_url += args
 
-        res = self.apiHandler.sendQuery(rq_url)
+        res = self.apiHandler.sendQuery(rq_url, 'match-ids')
         return res
     
     def getMatchData(self, match_id):
         rq_url = f'{self.standardPrefix}/match/v5/matches/{match_id}'
         
-        res = self.apiHandler.sendQuery(rq_url)
+        res = self.apiHandler.sendQuery(rq_url, 'match')
         return res
     
     def getTimelineData(self, match_id):
         rq_url = f'{self.standardPrefix}/match/v5/matches/{match_id}/timeline'
         
-        res = self.apiHandler.sendQuery(rq_url)
+        res = self.apiHandler.sendQuery(rq_url, 'timeline')
+        return res
+
+    def getMatchDataBatch(self, match_ids):
+        # Like getMatchData, but fetches all match_ids concurrently - yields results in order
+        rq_urls = [f'{self.standardPrefix}/match/v5/matches/{match_id}' for match_id in match_ids]
+
+        res = self.apiHandler.sendQueries(rq_urls, 'match')
+        return res
+
+    def getTimelineDataBatch(self, match_ids):
+        # Like getTimelineData, but fetches all match_ids concurrently - yields results in order
+        rq_urls = [f'{self.standardPrefix}/match/v5/matches/{match_id}/timeline' for match_id in match_ids]
+
+        res = self.apiHandler.sendQueries(rq_urls, 'timeline')
         return res
 
 
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+from termcolor import cprint
+
+from src.extract import EXTRACT_VERSION, ROW_DTYPES
+
+
+# Storage fingerprints of both documents - (mtime, size) for files, (offset, length) for packs
+FINGERPRINT_COLUMNS = [
+    'summary_stamp',
+    'summary_size',
+    'timeline_stamp',
+    'timeline_size',
+]
+
+# Full column layout of a cache file
+CACHE_DTYPES = {
+    **{col: 'int64' for col in FINGERPRINT_COLUMNS},
+    'included': 'bool',
+    **ROW_DTYPES,
+}
+
+
+def matchFingerprint(storage, game_map, match_id):
+    # Past matches never change, so this is enough to notice a re-download
+    return (
+        storage.fingerprint(game_map, 'summary', match_id)
+        + storage.fingerprint(game_map, 'timeline', match_id)
+    )
+
+
+class MatchRowCache:
+    # Persistent columnar (feather) cache of extracted per-match rows
+    # Indexed by match ID; matches that were filtered out are kept with included=False
+    #   so they don't get parsed again either
+
+    def __init__(self, puuid, game_map, cache_dir='data/cache'):
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / f'rows_{puuid[:12]}_{game_map}.feather'
+        self.meta_path = self.path.with_suffix('.json')
+
+        # Any change in extraction logic, column set or filters gives a new key
+        key_source = json.dumps([EXTRACT_VERSION, CACHE_DTYPES, puuid, game_map])
+        self.key = hashlib.sha1(key_source.encode()).hexdigest()
+
+
+    def load(self):
+        # Returns None if there is no usable cache
+        if not self.path.exists() or not self.meta_path.exists():
+            return None
+
+        with open(self.meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get('key') != self.key:
+            cprint('Row cache is out of date - rebuilding', 'yellow')
+            return None
+
+        df = pd.read_feather(self.path)
+        df = df.set_index('match_id')
+        return df
+
+
+    def save(self, df):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write to temp files first so an interrupted save can't leave a half-written cache
+        tmp_path = self.path.with_suffix('.feather.tmp')
+        df.rename_axis('match_id').reset_index().to_feather(tmp_path)
+        os.replace(tmp_path, self.path)
+
+        tmp_meta_path = self.meta_path.with_suffix('.json.tmp')
+        with open(tmp_meta_path, 'w') as f:
+            json.dump({'key': self.key, 'rows': len(df)}, f)
+        os.replace(tmp_meta_path, self.meta_path)
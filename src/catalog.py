@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+from termcolor import cprint
+
+from src.storage import getStorage
+
+
+# Persistent catalog of every match in storage (see src.storage)
+# Lets the fetcher and AppDataHandler look up what is stored without listing directories, and
+#   filter matches by map and by a player's role/lane/champion without opening any match files
+
+# Bump when the tables rebuild() fills change - older catalogs are then rebuilt from storage
+CATALOG_VERSION = 3
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    game_map TEXT NOT NULL,
+    queue_id INTEGER,
+    start_ts INTEGER,
+    duration INTEGER,
+    has_summary INTEGER NOT NULL DEFAULT 0,
+    has_timeline INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS matches_by_map ON matches (game_map, match_id);
+
+-- Header of every participant of every match, for filtering before anything is loaded
+CREATE TABLE IF NOT EXISTS match_players (
+    puuid TEXT NOT NULL,
+    match_id TEXT NOT NULL,
+    participant_id INTEGER, -- As used in timelines
+    team_id INTEGER,
+    role TEXT,
+    lane TEXT,
+    champion TEXT,
+    PRIMARY KEY (puuid, match_id)
+);
+CREATE INDEX IF NOT EXISTS match_players_by_match ON match_players (match_id);
+
+-- Matches in queues we don't store, so they are never requested again
+CREATE TABLE IF NOT EXISTS ignored_matches (
+    match_id TEXT PRIMARY KEY,
+    queue_id INTEGER
+);
+
+-- High-water marks for incremental sync, as epoch seconds
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+
+class MatchCatalog:
+
+    def __init__(self, path='data/catalog.sqlite3', storage=None):
+        self.path = Path(path)
+        self.storage = storage if storage is not None else getStorage()
+
+        self.is_new = not self.path.exists()
+        os.makedirs(self.path.parent, exist_ok=True)
+
+        # Shared between fetch threads, so serialize access ourselves
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if not self.is_new and version < CATALOG_VERSION:
+            cprint('Match catalog is out of date - it will be rebuilt', 'yellow')
+            self._conn.executescript('DROP TABLE IF EXISTS matches; DROP TABLE IF EXISTS match_players;')
+            self.is_new = True
+        self._conn.executescript(_schema)
+        self._conn.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+
+
+    @staticmethod
+    def _summaryRows(match_id, game_map, summary):
+        # Row for matches (without has_timeline) and rows for match_players
+        info = summary['info']
+        match_row = (match_id, game_map, info['queueId'], info['gameStartTimestamp'], info['gameDuration'])
+        player_rows = [
+            (puuid, match_id, player.get('participantId', i + 1), player['teamId'], player['role'], player['lane'], player['championName'])
+            for i, (puuid, player) in enumerate(zip(summary['metadata']['participants'], info['participants']))
+        ]
+        return match_row, player_rows
+
+
+    def recordSummary(self, match_id, game_map, summary):
+        match_row, player_rows = self._summaryRows(match_id, game_map, summary)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO matches (match_id, game_map, queue_id, start_ts, duration, has_summary)
+                VALUES (?, ?, ?, ?, ?, 1)
+                ON CONFLICT (match_id) DO UPDATE SET
+                    game_map = excluded.game_map,
+                    queue_id = excluded.queue_id,
+                    start_ts = excluded.start_ts,
+                    duration = excluded.duration,
+                    has_summary = 1
+            ''', match_row)
+            self._conn.executemany('INSERT OR REPLACE INTO match_players VALUES (?, ?, ?, ?, ?, ?, ?)', player_rows)
+
+
+    def recordTimeline(self, match_id):
+        # Timelines don't say which map they're from, so the summary has to be recorded first
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                'UPDATE matches SET has_timeline = 1 WHERE match_id = ?', (match_id,)
+            ).rowcount
+        if updated == 0:
+            raise KeyError(f'No summary recorded for {match_id}')
+
+
+    def recordIgnored(self, match_id, queue_id):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO ignored_matches VALUES (?, ?)', (match_id, queue_id))
+
+
+    def ignoredIds(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT match_id FROM ignored_matches').fetchall()
+        return {row[0] for row in rows}
+
+
+    def syncWindow(self, puuid=None):
+        # (oldest, newest) epoch seconds between which every match has been synced, or None if never synced
+        # Each account has its own window - puuid=None is the main account's (see src.accounts)
+        oldest, newest = self._syncNames(puuid)
+        with self._lock:
+            rows = dict(self._conn.execute('SELECT name, value FROM sync_state').fetchall())
+        if oldest not in rows or newest not in rows:
+            return None
+        return rows[oldest], rows[newest]
+
+
+    def setSyncWindow(self, oldest, newest, puuid=None):
+        oldest_name, newest_name = self._syncNames(puuid)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO sync_state VALUES (?, ?)',
+                [(oldest_name, oldest), (newest_name, newest)],
+            )
+
+
+    @staticmethod
+    def _syncNames(puuid):
+        if puuid is None:
+            return 'oldest', 'newest'
+        return f'oldest:{puuid}', f'newest:{puuid}'
+
+
+    def oldestStart(self, match_ids):
+        # Earliest start (epoch seconds) among match_ids, or None if none of them are stored
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT MIN(start_ts) FROM matches WHERE match_id IN ({", ".join("?" * len(match_ids))})',
+                list(match_ids),
+            ).fetchone()
+        return None if row[0] is None else row[0] // 1000
+
+
+    def mapOf(self, match_id):
+        with self._lock:
+            row = self._conn.execute('SELECT game_map FROM matches WHERE match_id = ?', (match_id,)).fetchone()
+        return None if row is None else row[0]
+
+
+    def doHaveData(self):
+        # {match_id: [summary_bool, timeline_bool]}
+        with self._lock:
+            rows = self._conn.execute('SELECT match_id, has_summary, has_timeline FROM matches').fetchall()
+        return {match_id: [bool(has_summary), bool(has_timeline)] for match_id, has_summary, has_timeline in rows}
+
+
+    def matchIds(self, game_map, complete=True, puuid=None, role=None):
+        # Sorted oldest -> newest (match IDs increase over time)
+        # With puuid, only matches that player is in - and with role too, only where they played that role
+        query = 'SELECT m.match_id FROM matches m'
+        params = []
+        if puuid is not None:
+            query += ' JOIN match_players p ON p.match_id = m.match_id AND p.puuid = ?'
+            params.append(puuid)
+            if role is not None:
+                query += ' AND p.role = ?'
+                params.append(role)
+        query += ' WHERE m.game_map = ?'
+        params.append(game_map)
+        if complete:
+            query += ' AND m.has_summary AND m.has_timeline'
+        query += ' ORDER BY m.match_id'
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [row[0] for row in rows]
+
+
+    def playersFrame(self, game_map):
+        # match_players for every match of a map, as a DataFrame
+        with self._lock:
+            return pd.read_sql_query('''
+                SELECT p.* FROM match_players p
+                JOIN matches m ON m.match_id = p.match_id
+                WHERE m.game_map = ?
+            ''', self._conn, params=(game_map,))
+
+
+    def rebuild(self):
+        # Reconstruct the matches table from what is in storage
+        # Ignored matches and sync state aren't stored anywhere else, so they are kept
+        match_rows = {}
+        player_rows = []
+        for game_map in self.storage.maps():
+            for match_id, summary in self.storage.iterRecords(game_map, 'summary'):
+                match_row, match_player_rows = self._summaryRows(match_id, game_map, summary)
+                match_rows[match_id] = [*match_row, 1, 0]
+                player_rows.extend(match_player_rows)
+
+            for match_id in self.storage.matchIds(game_map, 'timeline'):
+                if match_id in match_rows:
+                    match_rows[match_id][-1] = 1
+                else:
+                    cprint(f'Timeline without summary: {game_map}/{match_id}', 'yellow')
+
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM matches')
+            self._conn.execute('DELETE FROM match_players')
+            self._conn.executemany('INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?)', match_rows.values())
+            self._conn.executemany('INSERT OR REPLACE INTO match_players VALUES (?, ?, ?, ?, ?, ?, ?)', player_rows)
+
+        cprint(f'Rebuilt match catalog with {len(match_rows)} matches', 'green')
+        self.is_new = False
+
+
+
+if __name__ == '__main__':
+    # python -m src.catalog rebuild
+    if sys.argv[1:] == ['rebuild']:
+        MatchCatalog().rebuild()
+    else:
+        print('Usage: python -m src.catalog rebuild')
@@ -0,0 +1,69 @@
+import json
+import os
+from pathlib import Path
+
+
+# On-disk state of a long historical crawl (getData.py option 2), saved after every page
+# so a crash or Ctrl-C resumes where it stopped instead of paging from zero again
+
+class CrawlCheckpoint:
+
+    def __init__(self, path='data/crawl_checkpoint.json'):
+        self.path = Path(path)
+
+        self.start_idx = 0 # Pagination cursor for getMatchHistory
+        self.pending = [] # Match IDs of the page being worked on
+        self.failed = {} # match_id: {'status': last status, 'attempts': n}
+
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.start_idx = state['start_idx']
+            self.pending = state['pending']
+            self.failed = state['failed']
+
+
+    @property
+    def is_resumed(self):
+        return bool(self.start_idx or self.pending or self.failed)
+
+
+    def recordFailures(self, failed_matches):
+        # failed_matches is {match_id: status}
+        for match_id, status in failed_matches.items():
+            entry = self.failed.setdefault(match_id, {'status': status, 'attempts': 0})
+            entry['status'] = status
+            entry['attempts'] += 1
+
+
+    def recordSuccess(self, match_ids):
+        for match_id in match_ids:
+            self.failed.pop(match_id, None)
+
+
+    def retryable(self, max_attempts):
+        # 404s won't ever succeed, so they are only kept for the record
+        return [
+            match_id for match_id, entry in self.failed.items()
+            if entry['status'] != 404 and entry['attempts'] < max_attempts
+        ]
+
+
+    def save(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp_path = self.path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'start_idx': self.start_idx,
+                'pending': self.pending,
+                'failed': self.failed,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+    def clear(self):
+        if self.path.exists():
+            os.remove(self.path)
+        self.start_idx = 0
+        self.pending = []
+        self.failed = {}
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+# Picks which points of a long series to actually send to the browser
+# Every method returns sorted indexes into x/y, always including the first and last point and the
+#   series' minimum and maximum, so the visible extremes never change. NaN values are never picked.
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: one point per bucket, the one making the largest triangle with
+    #   the point picked in the previous bucket and the average of the next bucket - keeps the shape
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= n_out or n_out < 3:
+        return np.arange(len(x))
+
+    edges = np.linspace(1, len(x) - 1, n_out - 1).astype(np.int64)
+    # Average point of every bucket, for looking one bucket ahead
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1])[:len(counts)] / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1])[:len(counts)] / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = len(x) - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[prev] - avg_x[i]) * (by - y[prev]) - (x[prev] - bx) * (avg_y[i] - y[prev]))
+        prev = start + int(np.argmax(area))
+        picked[i + 1] = prev
+    return picked
+
+
+def minMax(x, y, n_out):
+    # The lowest and highest point of each of n_out / 2 equal-count buckets - cheapest, keeps every spike
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= n_out or n_out < 4:
+        return np.arange(len(y))
+
+    edges = np.linspace(0, len(y), n_out // 2 + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(len(edges)), np.diff(np.append(edges, len(y))))
+    # Within each bucket, sort by value - the first and last entries are the bucket's min and max
+    by_value = np.lexsort((y, bucket))
+    ends = np.append(edges[1:], len(y)) - 1
+    return np.unique(np.concatenate([by_value[edges], by_value[ends], [0, len(y) - 1]]))
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': minMax,
+}
+
+
+def downsample(x, y, n_out, method='lttb'):
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= n_out:
+        return valid
+
+    vx = np.asarray(x, dtype=np.float64)[valid]
+    vy = y[valid]
+    picked = DOWNSAMPLERS[method](vx, vy, n_out)
+    picked = np.union1d(picked, [np.argmin(vy), np.argmax(vy)])
+    return valid[picked]
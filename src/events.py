@@ -0,0 +1,161 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from termcolor import cprint
+
+from src.frame import RowAccumulator
+from src.timeline import readTimelineEvents
+
+
+# Columnar store of every timeline event (kills, objectives, wards, items, ...) of a map
+# One row per event, sorted by match then timestamp. Participant columns hold timeline participantIds
+#   (participant index + 1), 0 meaning nobody (minions, turrets, or not applicable to the event type).
+# Saved as a feather file next to the map's historical data, so timelines only ever get parsed once.
+#   New matches are appended the next time the store is loaded.
+
+# Bump when the columns or the way they're filled change - saved stores are then rebuilt
+EVENTS_VERSION = 1
+
+EVENT_DTYPES = {
+    'match_id': 'category',
+    'timestamp': 'int32', # ms since game start
+    'type': 'category',
+    'killer': 'int8', # killerId, or for non-kill events whoever did it (creatorId/participantId)
+    'victim': 'int8',
+    'assists': 'int16', # Bit (participantId - 1) set for each assisting participant
+    'team': 'int16', # killerTeamId, or teamId for buildings (the team that lost it)
+    'x': 'int16', # -1 without a position
+    'y': 'int16',
+    'monster_type': 'category',
+    'building_type': 'category',
+}
+
+
+def _eventRow(match_id, event):
+    position = event.get('position')
+    assists = 0
+    for participant_id in event.get('assistingParticipantIds', ()):
+        assists |= 1 << (participant_id - 1)
+    return {
+        'match_id': match_id,
+        'timestamp': event['timestamp'],
+        'type': event['type'],
+        'killer': event.get('killerId', event.get('creatorId', event.get('participantId', 0))),
+        'victim': event.get('victimId', 0),
+        'assists': assists,
+        'team': event.get('killerTeamId', event.get('teamId', 0)),
+        'x': position['x'] if position else -1,
+        'y': position['y'] if position else -1,
+        'monster_type': event.get('monsterType'),
+        'building_type': event.get('buildingType'),
+    }
+
+
+def _parseEvents(storage, game_map, match_ids):
+    events = RowAccumulator(EVENT_DTYPES, index_name=None)
+    for match_id in match_ids:
+        with storage.open(game_map, 'timeline', match_id) as f:
+            for event in readTimelineEvents(f):
+                events.append(len(events), _eventRow(match_id, event))
+    return events.toFrame().reset_index(drop=True)
+
+
+class EventStore:
+
+    def __init__(self, df):
+        self.df = df
+
+        # Match index - each match's events are one contiguous run of rows
+        codes = df['match_id'].cat.codes.to_numpy()
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+        ends = np.r_[starts[1:], len(codes)]
+        categories = df['match_id'].cat.categories
+        self._match_rows = {categories[codes[start]]: (start, end) for start, end in zip(starts, ends)}
+
+        # Type index - row numbers of each event type, in ascending order
+        codes = df['type'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(df['type'].cat.categories) + 1))
+        self._type_rows = {
+            event_type: order[bounds[i]:bounds[i + 1]]
+            for i, event_type in enumerate(df['type'].cat.categories)
+        }
+
+
+    def forMatch(self, match_id):
+        start, end = self._match_rows.get(match_id, (0, 0))
+        return self.df.iloc[start:end]
+
+
+    def ofType(self, *event_types):
+        rows = [self._type_rows[event_type] for event_type in event_types if event_type in self._type_rows]
+        if not rows:
+            return self.df.iloc[:0]
+        return self.df.iloc[np.sort(np.concatenate(rows))]
+
+
+    def deathsOf(self, puuid, players):
+        # Every CHAMPION_KILL where puuid died, with the killer's champion
+        # players is MatchCatalog.playersFrame for the same map
+        # Killers without a champion (turrets, minions, executes) get NaN
+        kills = self.ofType('CHAMPION_KILL')
+        own = players.loc[players['puuid'] == puuid, ['match_id', 'participant_id']]
+        deaths = kills.merge(
+            own.rename(columns={'participant_id': 'victim'}).astype({'match_id': kills['match_id'].dtype, 'victim': 'int8'}),
+            on=['match_id', 'victim'],
+        )
+        killers = players[['match_id', 'participant_id', 'champion']].rename(
+            columns={'participant_id': 'killer', 'champion': 'killer_champion'}
+        )
+        killers = killers[killers['match_id'].isin(deaths['match_id'].unique())]
+        return deaths.merge(
+            killers.astype({'match_id': kills['match_id'].dtype, 'killer': 'int8'}),
+            on=['match_id', 'killer'],
+            how='left',
+        )
+
+
+def loadEventStore(storage, catalog, game_map):
+    base_dir = storage.base_dir / game_map
+    data_path = base_dir / 'events.feather'
+    meta_path = base_dir / 'events.json'
+
+    old_ids = []
+    if data_path.exists() and meta_path.exists():
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta['version'] == EVENTS_VERSION:
+            old_ids = meta['match_ids']
+        else:
+            cprint('Event store is out of date - rebuilding', 'yellow')
+
+    known = set(old_ids)
+    new_ids = [match_id for match_id in catalog.matchIds(game_map) if match_id not in known]
+    old_df = pd.read_feather(data_path) if old_ids else None
+    if old_df is not None and not old_df['match_id'].isin(known).all():
+        # An update interrupted before its meta was replaced - drop the events of matches the meta doesn't list
+        old_df = old_df[old_df['match_id'].isin(known)].reset_index(drop=True)
+        old_df['match_id'] = old_df['match_id'].cat.remove_unused_categories()
+    if not new_ids:
+        if old_df is None:
+            return EventStore(RowAccumulator(EVENT_DTYPES, index_name=None).toFrame().reset_index(drop=True))
+        return EventStore(old_df)
+
+    cprint(f'Adding events of {len(new_ids)} timelines to the event store', 'green')
+    new_df = _parseEvents(storage, game_map, new_ids)
+    df = new_df if old_df is None else pd.concat([old_df, new_df], ignore_index=True).astype(EVENT_DTYPES)
+    match_ids = old_ids + new_ids
+
+    # Swap the new files in only once they're complete, meta last, so an interrupted update keeps the old ones
+    os.makedirs(base_dir, exist_ok=True)
+    tmp_path = base_dir / 'events.feather.tmp'
+    meta_tmp_path = base_dir / 'events.json.tmp'
+    df.to_feather(tmp_path)
+    with open(meta_tmp_path, 'w') as f:
+        json.dump({'version': EVENTS_VERSION, 'match_ids': match_ids}, f)
+    os.replace(tmp_path, data_path)
+    os.replace(meta_tmp_path, meta_path)
+
+    return EventStore(df)
@@ -0,0 +1,65 @@
+
+from src.schema import COLUMNS, MatchContext, decodeSummary
+from src.timeline import readTimelineFrames
+
+
+# Per-match row extraction
+# Kept free of AppDataHandler state so the cache (and anything else that needs rows) can call it directly
+# What goes in a row is declared in src.schema
+
+
+# Bump whenever extractMatchRow changes what it produces - invalidates every on-disk row cache
+EXTRACT_VERSION = 5
+
+_queueIdToMap = { # Modified from https://static.developer.riotgames.com/docs/lol/queues.json
+    400: 'summoners_rift', # draft
+    420: 'summoners_rift', # ranked
+    430: 'summoners_rift', # blind pick
+    440: 'summoners_rift', # ranked flex
+    450: 'howling_abyss', # aram
+    700: 'summoners_rift', # clash
+}
+
+GAME_MAPS = ('summoners_rift', 'howling_abyss')
+
+# Columns produced by extractMatchRow, with the dtype each one is stored as
+# game_index and negative_day_index are derived by AppDataHandler once all rows are known
+ROW_DTYPES = {column.name: column.dtype for column in COLUMNS}
+ROW_COLUMNS = list(ROW_DTYPES)
+
+# The only parts of a timeline extractMatchRow looks at
+TIMELINE_FRAMES = (15,)
+TIMELINE_FIELDS = ('totalGold', 'minionsKilled')
+
+
+def extractMatchRow(match_summary_data, timeline_frames, puuid, game_map):
+    # Returns a dict keyed by ROW_COLUMNS, or None if the match is filtered out by game_map
+    # Matches of every role are kept (see the role column)
+    # match_summary_data needs at least the fields src.schema decodes
+    # timeline_frames is {frame_idx: participantFrames} for TIMELINE_FRAMES, see src.timeline.readTimelineFrames
+
+    queueId = match_summary_data['info']['queueId']
+    if queueId not in _queueIdToMap:
+        return None
+    else:
+        if _queueIdToMap[queueId] != game_map:
+            return None
+
+    # Get data of user
+    target_idx = match_summary_data['metadata']['participants'].index(puuid)
+
+    if 15 not in timeline_frames:
+        print('Game shorter than 15m')
+
+    ctx = MatchContext(match_summary_data, target_idx, game_map, timeline_frames)
+    return {column.name: column.compute(ctx) for column in COLUMNS}
+
+
+def extractStoredMatch(game_map, match_id, storage, puuid):
+    # Top-level so it can run in a worker process
+    # Returns (match_id, row) so only the compact row is sent back to the parent, never the full JSON
+    match_summary_data = decodeSummary(storage.readBytes(game_map, 'summary', match_id))
+    with storage.open(game_map, 'timeline', match_id) as f:
+        timeline_frames = readTimelineFrames(f, TIMELINE_FRAMES, TIMELINE_FIELDS)
+
+    return match_id, extractMatchRow(match_summary_data, timeline_frames, puuid, game_map)
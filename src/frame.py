@@ -0,0 +1,67 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+
+# array.array typecodes for the plain numeric dtypes - everything else is buffered in a list
+_typecodes = {
+    'int64': 'q',
+    'int32': 'i',
+    'int16': 'h',
+    'int8': 'b',
+    'float64': 'd',
+    'bool': 'b',
+}
+
+# What to store for a column when a row has no value for it (eg. a filtered-out match)
+_fill_values = {
+    'int64': 0,
+    'int32': 0,
+    'int16': 0,
+    'int8': 0,
+    'float64': float('nan'),
+    'bool': False,
+}
+
+
+class RowAccumulator:
+    # Typed per-column buffers, filled one row at a time and turned into a DataFrame once at the end
+    # Avoids df.loc[index] = row, which can reallocate the whole frame per row and loses dtypes
+
+    def __init__(self, dtypes, index_name='match_id'):
+        self.dtypes = dict(dtypes)
+        self.index_name = index_name
+
+        self._index = []
+        self._buffers = {}
+        for col, dtype in self.dtypes.items():
+            if dtype in _typecodes:
+                self._buffers[col] = array(_typecodes[dtype])
+            else:
+                self._buffers[col] = []
+
+
+    def __len__(self):
+        return len(self._index)
+
+
+    def append(self, index, row):
+        # Columns missing from row get their dtype's fill value
+        self._index.append(index)
+        for col, buffer in self._buffers.items():
+            buffer.append(row.get(col, _fill_values.get(self.dtypes[col])))
+
+
+    def toFrame(self):
+        data = {}
+        for col, dtype in self.dtypes.items():
+            buffer = self._buffers[col]
+            if dtype in _typecodes:
+                data[col] = np.array(buffer, dtype=dtype)
+            elif dtype == 'category':
+                data[col] = pd.Categorical(buffer)
+            else:
+                data[col] = pd.array(buffer, dtype=dtype)
+
+        return pd.DataFrame(data, index=pd.Index(self._index, name=self.index_name))
@@ -0,0 +1,149 @@
+import threading
+import time
+
+
+# Token bucket rate limiter for the Riot API
+# Riot enforces an app-wide limit (shared by every endpoint) plus a separate limit per method, each with
+#   several windows (eg. 20 per 1s and 100 per 120s for a personal key). Every request has to fit in all
+#   of the app buckets and all of its method's buckets.
+# Limits start at the personal-key defaults and are replaced live from the X-*-Rate-Limit headers.
+# Riot counts calls in fixed windows rather than refilling continuously, so once the count headers say a
+#   window is spent, its bucket stops handing out tokens until that window resets.
+
+DEFAULT_APP_LIMITS = [(20, 1), (100, 120)]
+
+# Stay a little under the real limit - other clients (or a previous run) may share the key
+SAFETY_MARGIN = 0.95
+
+
+def parseLimitHeader(value):
+    # '20:1,100:120' -> [(20, 1), (100, 120)]
+    limits = []
+    for part in value.split(','):
+        calls, period = part.split(':')
+        limits.append((int(calls), int(period)))
+    return limits
+
+
+class TokenBucket:
+
+    def __init__(self, calls, period):
+        self.calls = calls
+        self.period = period
+        self.capacity = max(1, int(calls * SAFETY_MARGIN))
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / period
+        self.last_refill = time.monotonic()
+        self.window_start = None # When the server's current window began, as far as the count headers tell
+        self.last_used = 0
+        self.blocked_until = 0
+
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+
+    def waitTime(self, now):
+        # Seconds until one token is available
+        if self.blocked_until:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            # The spent window has reset - the server's count starts over
+            self.blocked_until = 0
+            self.window_start = None
+            self.last_used = 0
+            self.tokens = self.capacity
+            self.last_refill = now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.refill_rate
+
+
+    def consume(self):
+        self.tokens -= 1
+
+
+    def syncCount(self, used, now):
+        # Server says `used` calls already went into this window - never believe we have more left than that
+        if self.window_start is None or used < self.last_used or now >= self.window_start + self.period:
+            # First count seen of a new window - it began no later than now, so a reset estimated from
+            #   here is late rather than early
+            self.window_start = now
+        self.last_used = used
+        self.tokens = min(self.tokens, self.capacity - used)
+        if used >= self.capacity:
+            self.blocked_until = self.window_start + self.period
+
+
+class RateLimiter:
+
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS):
+        self._lock = threading.Lock()
+        self._app_buckets = self._makeBuckets(app_limits)
+        self._method_buckets = {}
+        self._paused_until = 0
+
+
+    @staticmethod
+    def _makeBuckets(limits):
+        return {period: TokenBucket(calls, period) for calls, period in limits}
+
+
+    def acquire(self, method=None):
+        # Blocks until a request for `method` fits in every bucket, then takes a token from each
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = list(self._app_buckets.values())
+                buckets.extend(self._method_buckets.get(method, {}).values())
+
+                wait = max([self._paused_until - now] + [bucket.waitTime(now) for bucket in buckets])
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.consume()
+                    return
+
+            time.sleep(wait)
+
+
+    def pause(self, seconds):
+        # Stop every request for `seconds` (used for Retry-After on a 429)
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+    def updateFromHeaders(self, method, headers):
+        with self._lock:
+            self._app_buckets = self._updateBuckets(
+                self._app_buckets,
+                headers.get('X-App-Rate-Limit'),
+                headers.get('X-App-Rate-Limit-Count'),
+            )
+            self._method_buckets[method] = self._updateBuckets(
+                self._method_buckets.get(method, {}),
+                headers.get('X-Method-Rate-Limit'),
+                headers.get('X-Method-Rate-Limit-Count'),
+            )
+
+
+    def _updateBuckets(self, buckets, limit_header, count_header):
+        if limit_header:
+            limits = parseLimitHeader(limit_header)
+            # Keep existing buckets (and their token counts) where the limit hasn't changed
+            new_buckets = {}
+            for calls, period in limits:
+                bucket = buckets.get(period)
+                if bucket is None or bucket.calls != calls:
+                    bucket = TokenBucket(calls, period)
+                new_buckets[period] = bucket
+            buckets = new_buckets
+
+        if count_header:
+            now = time.monotonic()
+            for used, period in parseLimitHeader(count_header):
+                if period in buckets:
+                    buckets[period].syncCount(used, now)
+
+        return buckets
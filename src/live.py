@@ -0,0 +1,43 @@
+import threading
+
+from termcolor import cprint
+
+
+# Live mode for the dashboard: polls for new games on an interval and appends them to the loaded data
+# fetch is called from the poller thread and returns {game_map: [match_id]} of recent stored matches
+#   (getData.UserDataInterface.pollRecent) - the poller hands those to the AppDataHandler, which skips
+#   the ones it already has
+
+class LivePoller:
+
+    def __init__(self, dh, fetch, interval=300, loader=None):
+        self.dh = dh
+        self.fetch = fetch
+        self.interval = interval # Seconds between polls
+        self.loader = loader # Initial BackgroundLoader, waited for before the first poll
+        self.last_added = 0 # Matches added by the last poll that found any
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+
+    def stop(self):
+        self._stop.set()
+
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.loader is not None and self.loader.loading:
+                continue
+            try:
+                added = self.dh.appendMatches(self.fetch())
+                if added:
+                    self.last_added = added
+            except Exception as e:
+                # Keep polling - the API or network being down for a while is expected
+                cprint(f'Live update failed: {e}', 'red')
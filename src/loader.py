@@ -0,0 +1,38 @@
+import threading
+
+from termcolor import cprint
+
+
+# Runs AppDataHandler.loadAllData on a background thread, so the dashboard can serve pages (from a
+#   snapshot or a loading screen) while the data loads. loadAllData swaps the new data in by itself.
+
+class BackgroundLoader:
+
+    def __init__(self, dh):
+        self.dh = dh
+        self.error = None # Exception of the last failed load
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+    @property
+    def loading(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self):
+        # Does nothing if a load is already running
+        with self._lock:
+            if self.loading:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+
+    def _run(self):
+        try:
+            self.dh.loadAllData()
+            self.error = None
+        except Exception as e:
+            cprint(f'Loading match data failed: {e}', 'red')
+            self.error = e
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+# Thread-safe caches for results derived from a loaded dataset (built figures, query results, metric frames)
+# Keys start with the dataset version, so a new dataset never hits results computed from the old one -
+#   those just age out instead of needing to be invalidated
+#   LRUCache - the most recently used max_items results, whatever their version
+#   VersionedCache - every result of the newest max_versions versions
+
+_MISSING = object()
+
+
+class LRUCache:
+
+    def __init__(self, max_items=128):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+
+        # Dash serves callbacks from several threads
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+
+    def get(self, key, build):
+        # Cached value for key, or build() - stored for next time
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is not _MISSING:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # Built outside the lock so one slow value doesn't hold up the others
+        value = build()
+
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+class VersionedCache:
+    # Keys are tuples whose first item is the dataset version - once a newer version makes more than
+    #   max_versions, everything stored under the oldest one is dropped together
+
+    def __init__(self, max_versions=2):
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._items = {}
+
+
+    def get(self, key):
+        # None if nothing is stored under key
+        with self._lock:
+            return self._items.get(key)
+
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            versions = list(dict.fromkeys(k[0] for k in self._items))
+            for old in versions[:-self.max_versions]:
+                for cached in [k for k in self._items if k[0] == old]:
+                    del self._items[cached]
+
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Inverted index from who was in a game to the player's games
+# Keys are (kind, value):
+#   opponent - lane opponent's champion (see MatchContext.rival_idx), eg. the enemy ADC when playing ADC
+#   ally / enemy - champion of any teammate / enemy
+#   duo - puuid of a teammate who is another tracked account (see src.accounts), not every random ally
+# Built from the catalog's match_players (no match files are opened) and stored in CSR layout: keys
+#   sorted by (kind, value), each owning a sorted int32 run of positions into match_ids.
+
+# Bump when what matchupPairs produces changes - persisted indexes are then rebuilt
+MATCHUPS_VERSION = 2
+
+MATCHUP_KINDS = ('opponent', 'ally', 'enemy', 'duo')
+
+
+def matchupPairs(df, players, puuid, partners=()):
+    # (kind, value, match_id) of every key of every game in df (a partition of AppDataHandler)
+    # players is MatchCatalog.playersFrame for the same map, partners the puuids duo games are with
+    players = players[players['match_id'].isin(df.index)]
+    own = players.loc[players['puuid'] == puuid, ['match_id', 'team_id']].rename(columns={'team_id': 'own_team'})
+    others = players[players['puuid'] != puuid].merge(own, on='match_id')
+    allies = others['team_id'] == others['own_team']
+    duos = allies & others['puuid'].isin(list(partners))
+
+    rivals = df['rival_idx'].dropna()
+    rivals = pd.DataFrame({
+        'match_id': rivals.index,
+        'participant_id': rivals.to_numpy(dtype='int64') + 1, # participantId is the index + 1
+    })
+    opponents = players.merge(rivals, on=['match_id', 'participant_id'])
+
+    pairs = [
+        ('opponent', opponents['champion'], opponents['match_id']),
+        ('ally', others.loc[allies, 'champion'], others.loc[allies, 'match_id']),
+        ('enemy', others.loc[~allies, 'champion'], others.loc[~allies, 'match_id']),
+        ('duo', others.loc[duos, 'puuid'], others.loc[duos, 'match_id']),
+    ]
+    return pd.concat([
+        pd.DataFrame({'kind': kind, 'value': values.to_numpy(dtype=str), 'match_id': match_ids.to_numpy()})
+        for kind, values, match_ids in pairs
+    ], ignore_index=True)
+
+
+class MatchupIndex:
+
+    def __init__(self, match_ids, kinds, values, offsets, rows):
+        self.match_ids = match_ids # Sorted, what rows point into
+        self.kinds = kinds
+        self.values = values
+        self.offsets = offsets # Key i owns rows[offsets[i]:offsets[i + 1]]
+        self.rows = rows
+        self._keys = None
+
+
+    @classmethod
+    def fromPairs(cls, match_ids, pairs):
+        # match_ids are the games indexed, pairs as returned by matchupPairs
+        match_ids = np.asarray(match_ids, dtype=str)
+        positions = pd.Index(match_ids).get_indexer(pairs['match_id'])
+        kinds = pairs['kind'].to_numpy(dtype=str)
+        values = pairs['value'].to_numpy(dtype=str)
+        keep = positions >= 0
+        kinds, values, positions = kinds[keep], values[keep], positions[keep]
+
+        order = np.lexsort((positions, values, kinds))
+        kinds, values, positions = kinds[order], values[order], positions[order]
+        starts = np.flatnonzero(np.concatenate([[True], (kinds[1:] != kinds[:-1]) | (values[1:] != values[:-1])])) \
+            if len(kinds) else np.empty(0, dtype=np.int64)
+        return cls(
+            match_ids,
+            kinds[starts],
+            values[starts],
+            np.append(starts, len(kinds)).astype(np.int64),
+            positions.astype(np.int32),
+        )
+
+
+    def pairs(self):
+        # Back to matchupPairs' layout
+        counts = np.diff(self.offsets)
+        return pd.DataFrame({
+            'kind': np.repeat(self.kinds, counts),
+            'value': np.repeat(self.values, counts),
+            'match_id': self.match_ids[self.rows],
+        })
+
+
+    def extend(self, match_ids, new_pairs):
+        # Index over match_ids (a superset of the indexed games) with new_pairs added
+        return MatchupIndex.fromPairs(match_ids, pd.concat([self.pairs(), new_pairs], ignore_index=True))
+
+
+    def lookup(self, kind, value):
+        # Match IDs of the player's games with that key, oldest first
+        if self._keys is None:
+            self._keys = {key: i for i, key in enumerate(zip(self.kinds, self.values))}
+        i = self._keys.get((kind, value))
+        if i is None:
+            return self.match_ids[:0]
+        return self.match_ids[self.rows[self.offsets[i]:self.offsets[i + 1]]]
+
+
+    def stats(self, metrics_df, kind, metrics, min_games=1):
+        # Games and mean of each metric (columns of metrics_df, eg. AppDataHandler.metrics) per value of kind,
+        #   most played first - only games in metrics_df count, so a role partition can be passed
+        keys = np.flatnonzero(self.kinds == kind) # Contiguous, keys are sorted by kind
+        if not len(keys):
+            return pd.DataFrame(columns=['games', *metrics])
+        first, last = self.offsets[keys[0]], self.offsets[keys[-1] + 1]
+        labels = np.repeat(self.values[keys], np.diff(self.offsets[keys[0]:keys[-1] + 2]))
+        positions = metrics_df.index.get_indexer(self.match_ids[self.rows[first:last]])
+        found = positions >= 0
+
+        grouped = metrics_df[list(metrics)].iloc[positions[found]].groupby(labels[found])
+        out = grouped.mean()
+        out.insert(0, 'games', grouped.size())
+        out = out[out['games'] >= min_games]
+        return out.sort_values('games', ascending=False)
+
+
+    def save(self, path, partners=()):
+        # partners as passed to matchupPairs - an index built for other ones doesn't get loaded
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(MATCHUPS_VERSION),
+                partners=np.array(sorted(partners), dtype=str),
+                match_ids=self.match_ids,
+                kinds=self.kinds,
+                values=self.values,
+                offsets=self.offsets,
+                rows=self.rows,
+            )
+        os.replace(tmp_path, path)
+
+
+    @classmethod
+    def load(cls, path, partners=()):
+        # None if there is no usable index at path
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as saved:
+            if int(saved['version']) != MATCHUPS_VERSION or saved['partners'].tolist() != sorted(partners):
+                return None
+            return cls(saved['match_ids'], saved['kinds'], saved['values'], saved['offsets'], saved['rows'])
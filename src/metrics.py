@@ -0,0 +1,87 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from src.lru import VersionedCache
+
+
+# Declarative registry of the per-game metrics the dashboard plots
+# Each Metric computes a vectorized, row-wise expression over the columns of a match_summary_df
+#   partition (see src.state), and carries how to present it: axis label, unit, and reference values
+#   (challenger/silver averages drawn as lines, y_range to clip the axis to).
+# Adding a metric means adding one entry to METRICS - figures and exports read them from the frame
+#   MetricCache builds (AppDataHandler.metrics), not from match_summary_df directly.
+
+Metric = namedtuple('Metric', ['name', 'title', 'axis', 'unit', 'compute', 'challenger', 'silver', 'y_range'])
+
+
+def _perMinute(df, col):
+    return df[col] / (df['length'] / 60)
+
+
+def _atLeastOne(series):
+    return series.clip(lower=1)
+
+
+METRICS = [
+    Metric('cspm', 'CS Per Minute', 'CS/Minute', 'cs/min',
+        lambda df: _perMinute(df, 'cs'), challenger=7.1, silver=5.5, y_range=None),
+    Metric('gpm', 'Gold Per Minute', 'Gold/Minute', 'gold/min',
+        lambda df: _perMinute(df, 'gold'), challenger=None, silver=None, y_range=None),
+    Metric('vsm', 'Vision Score Per Game', 'Vision Score/Hour', 'vision/h',
+        lambda df: df['vision_score'] / (df['length'] / 3600), challenger=44.8, silver=35.2, y_range=None),
+    Metric('dpg', 'Damage Per Gold', 'Damage/Gold', 'dmg/gold',
+        lambda df: df['dmg_champions'] / df['gold'], challenger=1.74, silver=1.77, y_range=None),
+    Metric('kda', 'KDA Ratio', 'KDA', 'ratio',
+        lambda df: (df['kills'] + df['assists']) / _atLeastOne(df['deaths']), challenger=2.55, silver=2.57, y_range=[0, 5]),
+    Metric('winrate', 'Win Rate', 'Win Rate %', '%',
+        lambda df: df['win'] * 100, challenger=None, silver=None, y_range=[0, 100]),
+    Metric('kp', 'Kill Participation', 'Kill Participation %', '%',
+        lambda df: (df['kills'] + df['assists']) / df['total_team_kills'] * 100, challenger=48.1, silver=46.2, y_range=None),
+    Metric('dpd', 'Damage Per Death', 'Damage/Death', 'dmg/death',
+        lambda df: df['dmg_champions'] / _atLeastOne(df['deaths']), challenger=3863, silver=3693, y_range=[0, 15_000]),
+    Metric('dsh', 'Damage Share', 'Damage Share %', '%',
+        lambda df: df['dmg_champions'] / df['total_team_dmg_champions'] * 100, challenger=22.8, silver=21.0, y_range=None),
+    Metric('gd15', 'Gold Difference @ 15 Minutes', 'Gold Difference', 'gold',
+        lambda df: df['gd15'], challenger=144, silver=128, y_range=[-2000, 2000]),
+    Metric('csdiff15', 'CS Difference @ 15 Minutes', 'CS Difference', 'cs',
+        lambda df: df['csdiff15'], challenger=2.4, silver=2.1, y_range=[-50, 50]),
+]
+
+METRICS_BY_NAME = {metric.name: metric for metric in METRICS}
+
+
+def computeMetrics(df):
+    # One float64 column per metric (NaN where undefined, eg. no lane opponent), plus game_index
+    # Division by zero (eg. a team without kills) gives NaN rather than inf
+    values = {'game_index': df['game_index'].to_numpy()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for metric in METRICS:
+            values[metric.name] = metric.compute(df).astype('float64').replace([np.inf, -np.inf], np.nan).to_numpy()
+    return pd.DataFrame(values, index=df.index)
+
+
+class MetricCache:
+    # Metric frames per (dataset version, partition key), for the newest few versions
+    # Metrics are row-wise, so when a snapshot was appended onto a cached one (see
+    #   AppDataHandler.appendMatches), only its new rows get computed
+
+    def __init__(self, max_versions=2):
+        self._frames = VersionedCache(max_versions) # (version, key): frame
+
+
+    def get(self, snapshot, key, df):
+        # snapshot is the src.state.DataSnapshot df comes from, key identifies the partition
+        frame = self._frames.get((snapshot.version, key))
+        base = self._frames.get((snapshot.base, key)) if snapshot.base is not None else None
+        if frame is not None:
+            return frame
+
+        if base is not None and len(base) <= len(df) and base.index.equals(df.index[:len(base)]):
+            frame = pd.concat([base, computeMetrics(df.iloc[len(base):])])
+        else:
+            frame = computeMetrics(df)
+
+        self._frames.put((snapshot.version, key), frame)
+        return frame
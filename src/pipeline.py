@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+import zlib
+
+from termcolor import cprint
+
+
+# Fetch -> write pipeline for getData.py
+# Fetched documents are handed to writer threads through bounded queues, so disk writes overlap the
+#   next requests. A full queue blocks the fetcher (backpressure) instead of piling documents up in memory.
+# Every document for a match goes to the same writer, so a timeline is never recorded before its summary.
+
+_STOP = object()
+
+
+class StageCounter:
+    # Throughput of one pipeline stage - items handled and time spent busy
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+
+    def add(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+
+    def summary(self, elapsed):
+        elapsed = max(elapsed, 1e-9)
+        return f'{self.name}: {self.items} items, {self.items / elapsed:.1f}/s, busy {self.busy / elapsed:.0%}'
+
+
+class WritePipeline:
+
+    def __init__(self, storage, catalog, writers=2, max_queued=16):
+        self.storage = storage
+        self.catalog = catalog
+
+        self._queues = [queue.Queue(maxsize=max_queued) for _ in range(writers)]
+        self._threads = []
+        self._errors = []
+        self._started = None
+
+        self.fetch_stats = StageCounter('fetch')
+        self.backpressure_stats = StageCounter('waiting on writers')
+        self.write_stats = StageCounter('write')
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+    def start(self):
+        self._started = time.monotonic()
+        for q in self._queues:
+            thread = threading.Thread(target=self._writer, args=(q,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+
+    def fetched(self, results):
+        # Wraps an iterator of fetch results, counting them and the time spent waiting for each
+        results = iter(results)
+        while True:
+            start = time.monotonic()
+            try:
+                result = next(results)
+            except StopIteration:
+                return
+            self.fetch_stats.add(1, time.monotonic() - start)
+            yield result
+
+
+    def submit(self, game_map, kind, match_id, data):
+        # Blocks while the writer's queue is full
+        if self._errors:
+            raise self._errors[0]
+
+        q = self._queues[zlib.crc32(match_id.encode()) % len(self._queues)]
+        start = time.monotonic()
+        q.put((game_map, kind, match_id, data))
+        self.backpressure_stats.add(1, time.monotonic() - start)
+
+
+    def _writer(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                q.task_done()
+                return
+
+            game_map, kind, match_id, data = item
+            start = time.monotonic()
+            try:
+                self.storage.write(game_map, kind, match_id, data)
+                if kind == 'summary':
+                    self.catalog.recordSummary(match_id, game_map, data)
+                else:
+                    self.catalog.recordTimeline(match_id)
+            except Exception as e:
+                cprint(f'Failed to write {kind} for {match_id}: {e}', 'red')
+                self._errors.append(e)
+            self.write_stats.add(1, time.monotonic() - start)
+            q.task_done()
+
+
+    def flush(self):
+        # Waits until everything submitted so far is written, for a pipeline kept open between batches
+        # Raises the first write error since the last flush
+        for q in self._queues:
+            q.join()
+        errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+
+    def close(self):
+        # Lets the writers drain everything already queued, then stops them
+        for q in self._queues:
+            q.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        if self._started is not None:
+            elapsed = time.monotonic() - self._started
+            for stats in (self.fetch_stats, self.backpressure_stats, self.write_stats):
+                cprint(stats.summary(elapsed), 'green')
+
+        if self._errors:
+            raise self._errors[0]
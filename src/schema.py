@@ -0,0 +1,132 @@
+import json
+from collections import namedtuple
+from typing import Any, List, TypedDict
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Declarative schema for the per-match columns of AppDataHandler.match_summary_df
+# Each Column names the participant fields it reads and how to compute its value from a MatchContext.
+# Adding a column means adding one entry to COLUMNS (and bumping EXTRACT_VERSION in src.extract).
+#
+# Summaries are decoded against the fields the schema needs. With msgspec installed, everything else in
+#   the document (~100 keys per participant) is skipped while decoding instead of being built into dicts.
+#   Without it, orjson (or failing that json) decodes the whole document.
+
+Column = namedtuple('Column', ['name', 'dtype', 'fields', 'compute'])
+
+
+class MatchContext:
+    # What a column's compute function gets to look at
+
+    def __init__(self, summary, target_idx, game_map, timeline_frames):
+        self.info = summary['info']
+        self.participants = summary['info']['participants']
+        self.target_idx = target_idx
+        self.player = self.participants[target_idx]
+        self.team = [x for x in self.participants if x['teamId'] == self.player['teamId']]
+        self.game_map = game_map
+        self.timeline_frames = timeline_frames
+        self._rival_idx = False
+
+
+    @property
+    def rival_idx(self):
+        # Index of the lane opponent, or None if there isn't exactly one
+        # Only Summoner's Rift has lanes - everyone on Howling Abyss shares the one
+        if self._rival_idx is False:
+            rival_id = [i for i, x in enumerate(self.participants) if (
+                self.game_map == 'summoners_rift'
+                and x['role'] == self.player['role']
+                and x['lane'] == self.player['lane']
+                and i != self.target_idx
+            )]
+            self._rival_idx = rival_id[0] if len(rival_id) == 1 else None
+        return self._rival_idx
+
+
+def _damageToChampions(player):
+    return (
+        player['physicalDamageDealtToChampions'] +
+        player['magicDamageDealtToChampions'] +
+        player['trueDamageDealtToChampions']
+    )
+
+_damage_fields = ('physicalDamageDealtToChampions', 'magicDamageDealtToChampions', 'trueDamageDealtToChampions')
+
+
+def _patch(game_version):
+    # '13.1.487.9123' -> '13.1'
+    return '.'.join(game_version.split('.')[:2])
+
+
+def _laneDiff(ctx, frame_idx, field):
+    # Own minus lane opponent's value of a participantFrames field, None if not available
+    # participantFrames is keyed by participantId, which is the participant's index + 1
+    if frame_idx not in ctx.timeline_frames or ctx.rival_idx is None:
+        return None
+    frame = ctx.timeline_frames[frame_idx]
+    return frame[str(ctx.target_idx + 1)][field] - frame[str(ctx.rival_idx + 1)][field]
+
+
+COLUMNS = [
+    Column('start_ts', 'int64', (), lambda ctx: ctx.info['gameStartTimestamp']),
+    Column('patch', 'category', (), lambda ctx: _patch(ctx.info['gameVersion'])),
+    Column('length', 'int32', ('timePlayed',), lambda ctx: ctx.player['timePlayed']), # Note - this excludes DCs
+    Column('cs', 'int32', ('totalMinionsKilled',), lambda ctx: ctx.player['totalMinionsKilled']),
+    Column('gold', 'int32', ('goldEarned',), lambda ctx: ctx.player['goldEarned']),
+    Column('champion', 'category', ('championName',), lambda ctx: ctx.player['championName']),
+    Column('vision_score', 'int32', ('visionScore',), lambda ctx: ctx.player['visionScore']),
+    Column('lane', 'category', ('lane',), lambda ctx: ctx.player['lane']),
+    Column('role', 'category', ('role',), lambda ctx: ctx.player['role']),
+    Column('dmg_champions', 'int32', _damage_fields, lambda ctx: _damageToChampions(ctx.player)),
+    Column('kills', 'int32', ('kills',), lambda ctx: ctx.player['kills']),
+    Column('deaths', 'int32', ('deaths',), lambda ctx: ctx.player['deaths']),
+    Column('assists', 'int32', ('assists',), lambda ctx: ctx.player['assists']),
+    Column('win', 'bool', ('win',), lambda ctx: ctx.player['win']),
+    Column('total_team_kills', 'int32', ('kills',), lambda ctx: sum(x['kills'] for x in ctx.team)),
+    Column('total_team_dmg_champions', 'int32', _damage_fields, lambda ctx: sum(_damageToChampions(x) for x in ctx.team)),
+    # Indexes into info.participants (and the participant axis of src.tensor)
+    Column('participant_idx', 'int8', (), lambda ctx: ctx.target_idx),
+    Column('rival_idx', 'Int8', (), lambda ctx: ctx.rival_idx),
+    # Lane difference @ 15 - nullable, missing for short games or ambiguous lanes
+    Column('gd15', 'Int32', (), lambda ctx: _laneDiff(ctx, 15, 'totalGold')),
+    Column('csdiff15', 'Int32', (), lambda ctx: _laneDiff(ctx, 15, 'minionsKilled')),
+]
+
+# Participant fields needed outside of individual columns (filtering, teams, lane opponent)
+_base_fields = ('role', 'lane', 'teamId')
+
+PARTICIPANT_FIELDS = sorted(set(_base_fields).union(*(column.fields for column in COLUMNS)))
+
+
+# Typed layout of the parts of a summary that get decoded
+_Participant = TypedDict('_Participant', {field: Any for field in PARTICIPANT_FIELDS})
+_Info = TypedDict('_Info', {
+    'queueId': int,
+    'gameStartTimestamp': int,
+    'gameVersion': str,
+    'participants': List[_Participant],
+})
+_Metadata = TypedDict('_Metadata', {'participants': List[str]})
+_Summary = TypedDict('_Summary', {'metadata': _Metadata, 'info': _Info})
+
+_decoder = msgspec.json.Decoder(_Summary) if msgspec is not None else None
+
+
+def decodeSummary(raw):
+    # raw is the summary JSON as bytes
+    # Returns nested dicts with (at least) every field the schema uses
+    if _decoder is not None:
+        return _decoder.decode(raw)
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
@@ -1,14 +1,43 @@
 
-import json
-import math
+import hashlib
 import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pendulum
 import yaml
 from termcolor import colored, cprint
 
+from src.accounts import trackedAccounts
+from src.aggregate import AggregateCache
+from src.bootstrap import groupIntervals
+from src.cache import CACHE_DTYPES, FINGERPRINT_COLUMNS, MatchRowCache, matchFingerprint
+from src.catalog import MatchCatalog
+from src.events import loadEventStore
+from src.extract import EXTRACT_VERSION, GAME_MAPS, ROW_DTYPES, extractStoredMatch
+from src.frame import RowAccumulator
+from src.lru import LRUCache
+from src.matchups import MatchupIndex, matchupPairs
+from src.metrics import MetricCache
+from src.storage import getStorage
+from src.tensor import loadTimelineTensor
+
+
+# Below this many matches to parse, loadSummonersRiftData stays serial even when parallel=True
+_MIN_PARALLEL_MATCHES = 200
+
+# Opening the catalog can rebuild it - handlers loading at once (one per account, see app.py) take turns,
+#   so only the first one rebuilds
+_catalog_lock = threading.Lock()
+
+# base is the version appendMatches extended to get this one (None for a full load)
+# matchups is {game_map: src.matchups.MatchupIndex} over the map's (game_map, None) partition
+DataSnapshot = namedtuple('DataSnapshot', ['version', 'partitions', 'base', 'matchups'], defaults=[None, None])
 
 
 class AppDataHandler:
@@ -18,186 +47,387 @@ class AppDataHandler:
     def __init__(self,
             game_map='summoners_rift',
             role='CARRY',
+            puuid=None, # Defaults to the main account, see src.accounts for the others
         ):
-        with open('data/private.yaml', 'r') as f:
-            user_data = yaml.safe_load(f)
-        self.puuid = user_data['puuid']
+        if puuid is None:
+            with open('data/private.yaml', 'r') as f:
+                user_data = yaml.safe_load(f)
+            puuid = user_data['puuid']
+        self.puuid = puuid
 
         self.game_map = game_map
         self.role = role
 
+        self.storage = getStorage()
         self.match_summary_df = None
-
-
-    def loadSummonersRiftData(self):
-        base_summoners_data_path = Path('data/historical/summoners_rift')
-        summary_data_path = base_summoners_data_path / 'summary'
-        timeline_data_path = base_summoners_data_path / 'timeline'
-
-        match_summary_files = os.listdir(summary_data_path)
-        match_timeline_files = os.listdir(timeline_data_path)
-        both_exist = set(match_summary_files) & set(match_timeline_files)
-        cprint(f'Found {len(both_exist)} files with summary + timeline data', 'green')
-        both_exist = list(both_exist)
-        both_exist.sort() # Now sorted oldest -> newest
-
-        cols = [
-            'game_index',
-            'negative_day_index',
-            'length',
-            'cs',
-            'gold',
-            'champion',
-            'vision_score',
-            'lane',
-            'dmg_champions',
-            'kills',
-            'deaths',
-            'assists',
-            'total_team_kills',
-            'total_team_dmg_champions',
-            'gd15',
-            'csdiff15',
-        ]
-        self.match_summary_df = pd.DataFrame(columns=cols)
-
-        now = pendulum.now()
-        floor_date = pendulum.datetime(year=now.year, month=now.month, day=now.day, tz=now.tz)
-        game_index = 0
-        for file in both_exist: # Most recent games = biggest ID
-            with open(summary_data_path / file, 'r') as f:
-                match_summary_data = json.load(f)
-            with open(timeline_data_path / file, 'r') as f:
-                match_timeline_data = json.load(f)
-
-            queueId = match_summary_data['info']['queueId']
-            _queueIdToMap = { # Modified from https://static.developer.riotgames.com/docs/lol/queues.json
-                400: 'summoners_rift', # draft
-                420: 'summoners_rift', # ranked
-                430: 'summoners_rift', # blind pick
-                440: 'summoners_rift', # ranked flex
-                450: 'howling_abyss', # aram
-                700: 'summoners_rift', # clash
-            }
-            if queueId not in _queueIdToMap:
-                continue
+        # What loadAllData loaded, swapped in as a whole so readers never see half of a load
+        self.snapshot = None # DataSnapshot
+        self.snapshot_path = Path('data/cache') / f'snapshot_{self.puuid[:12]}.pkl'
+        self._rows = {} # game_map: row cache frame behind the snapshot, for appendMatches
+        self._load_lock = threading.Lock() # One load or append at a time
+        self.metric_cache = MetricCache() # See metrics
+        self.aggregate_cache = AggregateCache() # See aggregate
+        self.query_cache = LRUCache(max_items=64) # See intervals, matchupStats
+        self.catalog = None # MatchCatalog, see _openCatalog
+        self.timeline = None # TimelineTensor, see loadTimelineMetrics
+        self.events = None # EventStore, see loadEvents
+        self.players = None # Catalog's match_players for the map, see loadEvents
+
+
+    @property
+    def partitions(self):
+        # (game_map, role): df, see loadAllData
+        return self.snapshot.partitions if self.snapshot is not None else {}
+
+
+    @property
+    def data_version(self):
+        # Changes whenever the loaded rows do - for caching anything derived from them
+        return self.snapshot.version if self.snapshot is not None else None
+
+
+    def _openCatalog(self):
+        # The handler's catalog, opened (and built, if there isn't one yet) on first use
+        with _catalog_lock:
+            if self.catalog is None:
+                catalog = MatchCatalog(storage=self.storage)
+                if catalog.is_new:
+                    catalog.rebuild()
+                self.catalog = catalog
+        return self.catalog
+
+
+    def loadSummonersRiftData(self, parallel=False, workers=None):
+        # Kept for callers that only want the current game_map/role - see loadAllData
+        self.loadAllData(parallel=parallel, workers=workers)
+
+
+    def loadAllData(self, parallel=False, workers=None):
+        # One pass over every map's matches of the player, whatever role they played
+        # Fills self.partitions with a frame per (game_map, role), plus (game_map, None) for all roles
+        #   together, then selects the handler's game_map/role - switching later doesn't read anything
+        # Safe to run on a background thread - the new data replaces the old in one assignment
+        # parallel=True spreads parsing over a process pool of `workers` processes (default = CPU count)
+        with self._load_lock:
+            self._loadAllData(parallel, workers)
+
+
+    def _loadAllData(self, parallel, workers):
+        catalog = self._openCatalog()
+
+        caches = {}
+        cached_dfs = {}
+        keep_ids = {}
+        to_parse = [] # (game_map, match_id), over all maps so they share one pool
+        fingerprints = {}
+        for game_map in GAME_MAPS:
+            # Filter on the catalog's per-player index, so other players' matches are never opened
+            match_ids = catalog.matchIds(game_map, puuid=self.puuid) # Sorted oldest -> newest
+            cprint(f'Found {len(match_ids)} {game_map} matches with summary + timeline data', 'green')
+
+            # Only parse matches that are new or changed since the cache was written
+            caches[game_map] = MatchRowCache(self.puuid, game_map)
+            cached_df = caches[game_map].load()
+            cached_dfs[game_map] = cached_df
+            if cached_df is not None:
+                cached_fingerprints = dict(zip(
+                    cached_df.index,
+                    zip(*(cached_df[col] for col in FINGERPRINT_COLUMNS)),
+                ))
             else:
-                if _queueIdToMap[queueId] != self.game_map:
-                    continue
-
-            # Get data of user
-            target_idx = match_summary_data['metadata']['participants'].index(self.puuid)
-            participant_data = match_summary_data['info']['participants'][target_idx]
-
-            if self.role is not None:
-                game_role = participant_data['role'] 
-                if game_role != self.role:
-                    continue
-            
-            to_write = []
-
-            # Index of row
-            index = file[:-5]
-
-            # game_index
-            to_write.append(game_index)
-            game_index += 1
-
-            # negative_day_index
-            # aka, how many days ago was the game
-            start_ts = match_summary_data['info']['gameStartTimestamp']
-            start_unix_ts = start_ts//1000
-            negative_days = math.ceil((pendulum.from_timestamp(start_unix_ts) - floor_date) / pendulum.duration(days=1)) - 1
-            to_write.append(negative_days)
-
-            # length
-            length_played_in_s = participant_data['timePlayed'] # Note - this excludes DCs
-            to_write.append(length_played_in_s)
-
-            # cs
-            cs = participant_data["totalMinionsKilled"]
-            to_write.append(cs)
-
-            # gold
-            gold = participant_data["goldEarned"]
-            to_write.append(gold)
-
-            # champion
-            champion = participant_data['championName']
-            to_write.append(champion)
-
-            # vision score per game
-            vision_score = participant_data['visionScore']
-            to_write.append(vision_score)
-
-            # lane
-            lane = participant_data['lane']
-            to_write.append(lane)
-
-            # total damage to champions
-            dmg_champions = (
-                participant_data['physicalDamageDealtToChampions'] +
-                participant_data['magicDamageDealtToChampions'] +
-                participant_data['trueDamageDealtToChampions']
-            )
-            to_write.append(dmg_champions)
-
-            # kda stats
-            kills = participant_data['kills']
-            deaths = participant_data['deaths']
-            assists = participant_data['assists']
-            to_write.extend([kills, deaths, assists])
-
-            # Anything involving other players
-            own_team = participant_data['teamId']
-            total_team_kills = 0
-            total_team_damage = 0
-            all_participant_data = match_summary_data['info']['participants']
-            for player_data in all_participant_data:
-                if player_data['teamId'] == own_team:
-                    # total team kills
-                    total_team_kills += player_data['kills']
-
-                    # total team damage to champions
-                    total_team_damage += (
-                        player_data['physicalDamageDealtToChampions'] +
-                        player_data['magicDamageDealtToChampions'] +
-                        player_data['trueDamageDealtToChampions']
-                    )
-
-            to_write.extend([total_team_kills, total_team_damage])
-                
-            # lane difference @ 15
-            if len(match_timeline_data['info']['frames']) >= 16:
-                rival_id = [i for i, x in enumerate(all_participant_data) if (
-                    x['role'] == self.role
-                    and x['lane'] == participant_data['lane']
-                    and i != target_idx
-                )]
-                if len(rival_id) != 1:
-                    to_write.extend([None, None])
+                cached_fingerprints = {}
 
+            keep_ids[game_map] = []
+            for match_id in match_ids: # Most recent games = biggest ID
+                fingerprint = matchFingerprint(self.storage, game_map, match_id)
+                if cached_fingerprints.get(match_id) == fingerprint:
+                    keep_ids[game_map].append(match_id)
                 else:
-                    rival_id = rival_id[0]
-                    fifteen_frame = match_timeline_data['info']['frames'][15]
-
-                    # gold diff @ 15
-                    own_gold = fifteen_frame['participantFrames'][str(target_idx)]['totalGold']
-                    rival_gold = fifteen_frame['participantFrames'][str(rival_id)]['totalGold']
-                    gd15 = own_gold - rival_gold
-                    to_write.append(gd15)
-
-                    # cs diff @ 15
-                    own_cs = fifteen_frame['participantFrames'][str(target_idx)]['minionsKilled']
-                    rival_cs = fifteen_frame['participantFrames'][str(rival_id)]['minionsKilled']
-                    csdiff15 = own_cs - rival_cs
-                    to_write.append(csdiff15)
+                    to_parse.append((game_map, match_id))
+                    fingerprints[match_id] = fingerprint
+
+        new_dfs = self._parseRows(to_parse, fingerprints, parallel, workers)
+        cprint(f'Loaded {sum(map(len, keep_ids.values()))} matches from cache, parsed {len(to_parse)}', 'green')
+
+        partitions = {}
+        rows = {}
+        # Two accounts can have loaded the very same matches (duo games), so the account is part of it too
+        version = hashlib.sha1(f'{EXTRACT_VERSION}:{self.puuid}'.encode())
+        for game_map in GAME_MAPS:
+            cached_df = cached_dfs[game_map]
+            new_df = new_dfs[game_map]
+            if cached_df is not None:
+                # Categories differ between the two halves, so restore dtypes after the concat
+                rows_df = pd.concat([cached_df.loc[keep_ids[game_map], list(CACHE_DTYPES)], new_df]).astype(CACHE_DTYPES)
             else:
-                print('Game shorter than 15m')
-                to_write.extend([None, None])
-
-            self.match_summary_df.loc[index] = to_write
-
+                rows_df = new_df
+            rows_df = rows_df.sort_index()
+
+            if len(new_df) or cached_df is None or len(keep_ids[game_map]) != len(cached_df):
+                caches[game_map].save(rows_df)
+            rows[game_map] = rows_df
+
+            # Match IDs + fingerprints identify exactly what was loaded
+            version.update(game_map.encode())
+            version.update(pd.util.hash_pandas_object(rows_df[FINGERPRINT_COLUMNS]).to_numpy().tobytes())
+
+            df = rows_df[rows_df['included']].drop(columns=FINGERPRINT_COLUMNS + ['included'])
+            partitions[(game_map, None)] = self._finishPartition(df)
+            for role in df['role'].cat.categories:
+                partitions[(game_map, role)] = self._finishPartition(df[df['role'] == role])
+
+        matchups = {game_map: self._loadMatchups(catalog, game_map, partitions[(game_map, None)]) for game_map in GAME_MAPS}
+
+        self._rows = rows
+        self.snapshot = DataSnapshot(version.hexdigest()[:16], partitions, matchups=matchups)
+        self.saveSnapshot()
+        self.selectPartition(self.game_map, self.role)
+
+
+    def appendMatches(self, new_matches):
+        # Adds newly stored matches ({game_map: [match_id]}, eg. from src.live) on top of what is loaded,
+        #   parsing only those and appending them to the partitions and row caches
+        # Matches that are already loaded are skipped. Returns how many matches were added.
+        # Falls back to loadAllData when that isn't possible - nothing loaded yet, or matches that don't
+        #   come after everything loaded so far (game_index would have to shift)
+        with self._load_lock:
+            if self._rows:
+                new_matches = {
+                    game_map: [match_id for match_id in match_ids if match_id not in self._rows[game_map].index]
+                    for game_map, match_ids in new_matches.items()
+                }
+            n_new = sum(map(len, new_matches.values()))
+            if not n_new:
+                return 0
+            if self.snapshot is None or not self._rows or any(
+                len(self._rows[game_map]) and min(match_ids) <= self._rows[game_map].index[-1]
+                for game_map, match_ids in new_matches.items() if match_ids
+            ):
+                append = False
+            else:
+                append = True
+                self._appendMatches(new_matches)
+        if not append:
+            self.loadAllData()
+        return n_new
+
+
+    def _appendMatches(self, new_matches):
+        to_parse = []
+        fingerprints = {}
+        for game_map, match_ids in new_matches.items():
+            for match_id in sorted(match_ids):
+                to_parse.append((game_map, match_id))
+                fingerprints[match_id] = matchFingerprint(self.storage, game_map, match_id)
+        if not to_parse:
+            return
+        new_dfs = self._parseRows(to_parse, fingerprints, parallel=False, workers=None)
+        cprint(f'Appending {len(to_parse)} new matches', 'green')
+
+        partitions = dict(self.snapshot.partitions)
+        matchups = dict(self.snapshot.matchups or {})
+        catalog = self._openCatalog()
+        version = hashlib.sha1(self.snapshot.version.encode())
+        for game_map, new_df in new_dfs.items():
+            if not len(new_df):
+                continue
+            rows_df = pd.concat([self._rows[game_map], new_df]).astype(CACHE_DTYPES)
+            MatchRowCache(self.puuid, game_map).save(rows_df)
+            self._rows[game_map] = rows_df
+
+            version.update(game_map.encode())
+            version.update(pd.util.hash_pandas_object(new_df[FINGERPRINT_COLUMNS]).to_numpy().tobytes())
+
+            df = new_df[new_df['included']].drop(columns=FINGERPRINT_COLUMNS + ['included'])
+            for role in [None] + sorted(df['role'].unique()):
+                part = df if role is None else df[df['role'] == role]
+                old = partitions.get((game_map, role))
+                if old is None:
+                    partitions[(game_map, role)] = self._finishPartition(part)
+                else:
+                    new_part = self._finishPartition(part, first_index=len(old))
+                    # Restore categoricals - categories differ between the two halves
+                    categories = {col: 'category' for col, dtype in old.dtypes.items() if dtype == 'category'}
+                    partitions[(game_map, role)] = pd.concat([old, new_part]).astype(categories)
+            matchups[game_map] = self._loadMatchups(catalog, game_map, partitions[(game_map, None)], matchups.get(game_map))
+
+        self.snapshot = DataSnapshot(version.hexdigest()[:16], partitions, base=self.snapshot.version, matchups=matchups)
+        self.saveSnapshot()
+        self.selectPartition(self.game_map, self.role)
+
+
+    def _parseRows(self, to_parse, fingerprints, parallel, workers):
+        # to_parse is [(game_map, match_id)], fingerprints {match_id: matchFingerprint}
+        # Returns {game_map: frame of CACHE_DTYPES rows}
+        new_rows = {game_map: RowAccumulator(CACHE_DTYPES) for game_map in GAME_MAPS}
+        for (game_map, _), (match_id, row) in zip(to_parse, self._parseMatches(to_parse, parallel, workers)):
+            if row is None:
+                row = {'included': False}
+            else:
+                row['included'] = True
+            row.update(zip(FINGERPRINT_COLUMNS, fingerprints[match_id]))
+            new_rows[game_map].append(match_id, row)
+        return {game_map: rows.toFrame() for game_map, rows in new_rows.items()}
+
+
+    def _loadMatchups(self, catalog, game_map, df, index=None):
+        # MatchupIndex over df's games - the persisted one (or index) if it covers them, extended with
+        #   just the new games if they were appended to it, otherwise built from scratch
+        path = Path('data/cache') / f'matchups_{self.puuid[:12]}_{game_map}.npz'
+        partners = [puuid for puuid in trackedAccounts().values() if puuid != self.puuid]
+        if index is None:
+            index = MatchupIndex.load(path, partners)
+        match_ids = df.index.to_numpy(dtype=str)
+        if index is not None and np.array_equal(index.match_ids, match_ids):
+            return index
+
+        players = catalog.playersFrame(game_map)
+        n_indexed = len(index.match_ids) if index is not None else 0
+        if index is not None and n_indexed <= len(match_ids) and np.array_equal(index.match_ids, match_ids[:n_indexed]):
+            index = index.extend(match_ids, matchupPairs(df.iloc[n_indexed:], players, self.puuid, partners))
+        else:
+            index = MatchupIndex.fromPairs(match_ids, matchupPairs(df, players, self.puuid, partners))
+        os.makedirs(path.parent, exist_ok=True)
+        index.save(path, partners)
+        return index
+
+
+    def saveSnapshot(self):
+        # Persists the loaded partitions, so the next start can show them before loading anything
+        os.makedirs(self.snapshot_path.parent, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix('.pkl.tmp')
+        pd.to_pickle({'extract_version': EXTRACT_VERSION, 'snapshot': tuple(self.snapshot)}, tmp_path)
+        os.replace(tmp_path, self.snapshot_path)
+
+
+    def loadSnapshot(self):
+        # Returns False if there is no usable snapshot
+        # The data may be out of date - follow up with loadAllData
+        if not self.snapshot_path.exists():
+            return False
+        saved = pd.read_pickle(self.snapshot_path)
+        if saved['extract_version'] != EXTRACT_VERSION:
+            return False
+        self.snapshot = DataSnapshot(*saved['snapshot'])
+        self.selectPartition(self.game_map, self.role)
+        return True
+
+
+    def partition(self, game_map, role=None, snapshot=None):
+        # Frame of one map/role loaded by loadAllData, role=None for all roles
+        # Pass snapshot to keep reading the same data while a reload may swap in a new one
+        partitions = (snapshot or self.snapshot).partitions
+        df = partitions.get((game_map, role))
+        if df is None:
+            # Never played - same columns, no rows
+            df = partitions[(game_map, None)].iloc[:0]
+        return df
+
+
+    def metrics(self, game_map, role=None, snapshot=None):
+        # Every src.metrics.METRICS of a partition, one column each, aligned with its rows
+        snapshot = snapshot or self.snapshot
+        return self.metric_cache.get(snapshot, (game_map, role), self.partition(game_map, role, snapshot))
+
+
+    def aggregate(self, game_map, role, spec, snapshot=None):
+        # Stats over time of a partition's metrics, spec is a src.aggregate.Aggregation (or its tuple)
+        snapshot = snapshot or self.snapshot
+        return self.aggregate_cache.get(
+            snapshot, (game_map, role), spec,
+            self.metrics(game_map, role, snapshot), self.partition(game_map, role, snapshot),
+        )
+
+
+    def intervals(self, game_map, role, metric, grouping, method='bootstrap', snapshot=None):
+        # Confidence intervals of a metric's mean per group (a src.bootstrap.GROUPINGS column) of games
+        snapshot = snapshot or self.snapshot
+        return self.query_cache.get(
+            (snapshot.version, (game_map, role), metric, grouping, method),
+            lambda: groupIntervals(
+                self.metrics(game_map, role, snapshot)[metric],
+                self.partition(game_map, role, snapshot)[grouping],
+                method=method,
+            ),
+        )
+
+
+    def matchupStats(self, game_map, role, kind, metrics=('winrate', 'gd15'), min_games=1, snapshot=None):
+        # Games and mean metrics per value of a src.matchups.MATCHUP_KINDS kind, eg. per lane opponent
+        snapshot = snapshot or self.snapshot
+        return self.query_cache.get(
+            (snapshot.version, (game_map, role), 'matchups', kind, tuple(metrics), min_games),
+            lambda: snapshot.matchups[game_map].stats(self.metrics(game_map, role, snapshot), kind, metrics, min_games),
+        )
+
+
+    def selectPartition(self, game_map, role=None):
+        # Switches match_summary_df to another map/role
+        self.game_map = game_map
+        self.role = role
+        self.match_summary_df = self.partition(game_map, role)
+
+
+    def _finishPartition(self, df, first_index=0):
+        df = df.drop(columns=['role'])
+
+        # game_index
+        df.insert(0, 'game_index', np.arange(first_index, first_index + len(df), dtype='int32'))
+
+        # negative_day_index
+        # aka, how many days ago was the game
+        floor_ts = pendulum.today().int_timestamp
+        negative_days = np.ceil((df['start_ts'].to_numpy() // 1000 - floor_ts) / 86400).astype('int64') - 1
+        df.insert(1, 'negative_day_index', negative_days)
+
+        # start_ts stays for src.aggregate
+        return df
+
+
+    def loadTimelineMetrics(self, minutes=(10, 15, 20, 25)):
+        # Adds gd/csdiff/xpdiff @ each minute to match_summary_df, sliced out of the timeline tensor
+        # Call after loadAllData - applies to the selected partition only
+        # Built on a copy, the snapshot's partitions are shared with other threads (and saveSnapshot)
+        self.timeline = loadTimelineTensor(self.storage, self._openCatalog(), self.game_map)
+
+        df = self.match_summary_df.copy()
+        own_idx = df['participant_idx'].to_numpy()
+        rival_idx = df['rival_idx'].fillna(-1).to_numpy(dtype='int64')
+        for minute in minutes:
+            for name, field in (('gd', 'totalGold'), ('csdiff', 'minionsKilled'), ('xpdiff', 'xp')):
+                col = f'{name}{minute}'
+                if col in ROW_DTYPES:
+                    continue # Already a row column, eg. gd15
+                diff = self.timeline.laneDiff(df.index, own_idx, rival_idx, minute, field)
+                df[col] = pd.Series(diff, index=df.index).astype('Int32')
+        self.match_summary_df = df
+
+
+    def loadEvents(self):
+        # Timeline events of every match on the map, eg. self.events.deathsOf(self.puuid, self.players)
+        catalog = self._openCatalog()
+        self.events = loadEventStore(self.storage, catalog, self.game_map)
+        self.players = catalog.playersFrame(self.game_map)
+
+
+    def _parseMatches(self, to_parse, parallel, workers):
+        # to_parse is [(game_map, match_id)]
+        # Yields (match_id, row) in the same order as to_parse, so game_index stays deterministic
+        extract = partial(extractStoredMatch, storage=self.storage, puuid=self.puuid)
+        game_maps = [game_map for game_map, _ in to_parse]
+        match_ids = [match_id for _, match_id in to_parse]
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if not parallel or workers < 2 or len(to_parse) < _MIN_PARALLEL_MATCHES:
+            # Pool startup costs more than it saves on small inputs
+            yield from map(extract, game_maps, match_ids)
+            return
+
+        cprint(f'Parsing {len(to_parse)} matches with {workers} workers', 'green')
+        chunksize = max(1, len(to_parse) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(extract, game_maps, match_ids, chunksize=chunksize)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,272 @@
+import io
+import json
+import os
+import sys
+import threading
+import zlib
+from pathlib import Path
+
+import yaml
+from termcolor import cprint
+
+
+# Storage backends for historical match data
+# Both store one JSON document per (game_map, kind, match_id), where kind is 'summary' or 'timeline'
+#   FileStorage - the original layout, data/historical/<map>/<kind>/<match>.json
+#   PackStorage - one append-only, zlib-compressed pack file per map and kind with an offset index
+# Pick the backend with `storage: files|pack` in data/private.yaml (default files)
+
+KINDS = ('summary', 'timeline')
+
+
+def getStorage():
+    with open('data/private.yaml', 'r') as f:
+        private_data = yaml.safe_load(f)
+    backend = private_data.get('storage', 'files')
+
+    if backend == 'files':
+        return FileStorage()
+    elif backend == 'pack':
+        return PackStorage()
+    else:
+        raise ValueError(f'Unknown storage backend: {backend}')
+
+
+class FileStorage:
+
+    def __init__(self, base_dir='data/historical'):
+        self.base_dir = Path(base_dir)
+
+
+    def _path(self, game_map, kind, match_id):
+        return self.base_dir / game_map / kind / f'{match_id}.json'
+
+
+    def maps(self):
+        if not self.base_dir.is_dir():
+            return []
+        return sorted(x.name for x in self.base_dir.iterdir() if x.is_dir())
+
+
+    def matchIds(self, game_map, kind):
+        kind_dir = self.base_dir / game_map / kind
+        if not kind_dir.is_dir():
+            return []
+        return sorted(x[:-5] for x in os.listdir(kind_dir) if x.endswith('.json'))
+
+
+    def has(self, game_map, kind, match_id):
+        return self._path(game_map, kind, match_id).exists()
+
+
+    def fingerprint(self, game_map, kind, match_id):
+        # Changes whenever the stored document does
+        stat = os.stat(self._path(game_map, kind, match_id))
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+    def open(self, game_map, kind, match_id):
+        # Text file object over the JSON document
+        return open(self._path(game_map, kind, match_id), 'r')
+
+
+    def read(self, game_map, kind, match_id):
+        with self.open(game_map, kind, match_id) as f:
+            return json.load(f)
+
+
+    def readBytes(self, game_map, kind, match_id):
+        # Raw JSON document, for decoders that work on bytes (see src.schema)
+        with open(self._path(game_map, kind, match_id), 'rb') as f:
+            return f.read()
+
+
+    def iterRecords(self, game_map, kind):
+        # Yields (match_id, data) for every document of this map and kind
+        for match_id in self.matchIds(game_map, kind):
+            yield match_id, self.read(game_map, kind, match_id)
+
+
+    def write(self, game_map, kind, match_id, data):
+        # Write to a temp file and rename, so a crash never leaves a half-written document behind
+        path = self._path(game_map, kind, match_id)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+class _ZlibSliceReader(io.RawIOBase):
+    # Decompresses one record of a pack file on demand, so partial readers (eg. src.timeline)
+    #   only pay for the part of the document they actually look at
+
+    def __init__(self, path, offset, length):
+        self._f = open(path, 'rb')
+        self._f.seek(offset)
+        self._remaining = length
+        self._decompressor = zlib.decompressobj()
+        self._pending = b''
+
+
+    def readable(self):
+        return True
+
+
+    def readinto(self, b):
+        while not self._pending:
+            if self._remaining == 0:
+                self._pending = self._decompressor.flush()
+                if not self._pending:
+                    return 0
+                break
+            chunk = self._f.read(min(64*1024, self._remaining))
+            self._remaining -= len(chunk)
+            self._pending = self._decompressor.decompress(chunk)
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class PackStorage:
+    # <base_dir>/<map>/<kind>.pack holds zlib-compressed JSON records back to back
+    # <base_dir>/<map>/<kind>.idx has one 'match_id offset length' line per record, appended after the record
+    #   itself is written, so a crash mid-write leaves at worst some unreferenced bytes at the end of the pack
+    # Rewriting a match appends a new record - the last index entry wins
+
+    def __init__(self, base_dir='data/packed', level=6):
+        self.base_dir = Path(base_dir)
+        self.level = level
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self):
+        # Picklable for worker processes - indexes are reloaded there on demand
+        return {'base_dir': self.base_dir, 'level': self.level}
+
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+    def _packPath(self, game_map, kind):
+        return self.base_dir / game_map / f'{kind}.pack'
+
+
+    def _indexPath(self, game_map, kind):
+        return self.base_dir / game_map / f'{kind}.idx'
+
+
+    def _index(self, game_map, kind):
+        # {match_id: (offset, length)} per (map, kind)
+        # Other writers (another PackStorage, eg. getData.py's, or another process) only ever append to
+        #   the .idx, so whatever it grew by since the last call is read in on top
+        key = (game_map, kind)
+        index, position = self._indexes.get(key, ({}, 0))
+        index_path = self._indexPath(game_map, kind)
+        if index_path.exists() and index_path.stat().st_size > position:
+            with open(index_path, 'rb') as f:
+                f.seek(position)
+                added = f.read()
+            added = added[:added.rfind(b'\n') + 1] # A line still being written is read next time
+            for line in added.decode('utf-8').splitlines():
+                match_id, offset, length = line.split()
+                index[match_id] = (int(offset), int(length))
+            position += len(added)
+        self._indexes[key] = (index, position)
+        return index
+
+
+    def maps(self):
+        if not self.base_dir.is_dir():
+            return []
+        return sorted(x.name for x in self.base_dir.iterdir() if x.is_dir())
+
+
+    def matchIds(self, game_map, kind):
+        with self._lock:
+            return sorted(self._index(game_map, kind))
+
+
+    def has(self, game_map, kind, match_id):
+        with self._lock:
+            return match_id in self._index(game_map, kind)
+
+
+    def fingerprint(self, game_map, kind, match_id):
+        with self._lock:
+            return self._index(game_map, kind)[match_id]
+
+
+    def open(self, game_map, kind, match_id):
+        with self._lock:
+            offset, length = self._index(game_map, kind)[match_id]
+        raw = _ZlibSliceReader(self._packPath(game_map, kind), offset, length)
+        return io.TextIOWrapper(io.BufferedReader(raw), encoding='utf-8')
+
+
+    def read(self, game_map, kind, match_id):
+        return json.loads(self.readBytes(game_map, kind, match_id))
+
+
+    def readBytes(self, game_map, kind, match_id):
+        # Raw JSON document, for decoders that work on bytes (see src.schema)
+        with self._lock:
+            offset, length = self._index(game_map, kind)[match_id]
+        with open(self._packPath(game_map, kind), 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length))
+
+
+    def iterRecords(self, game_map, kind):
+        # Sequential scan of a whole pack in file order, yielding (match_id, data)
+        with self._lock:
+            entries = sorted(self._index(game_map, kind).items(), key=lambda x: x[1][0])
+        with open(self._packPath(game_map, kind), 'rb') as f:
+            for match_id, (offset, length) in entries:
+                f.seek(offset)
+                yield match_id, json.loads(zlib.decompress(f.read(length)))
+
+
+    def write(self, game_map, kind, match_id, data):
+        record = zlib.compress(json.dumps(data).encode('utf-8'), self.level)
+
+        with self._lock:
+            index = self._index(game_map, kind)
+            os.makedirs(self.base_dir / game_map, exist_ok=True)
+            with open(self._packPath(game_map, kind), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(record)
+            with open(self._indexPath(game_map, kind), 'a') as f:
+                f.write(f'{match_id} {offset} {len(record)}\n')
+            index[match_id] = (offset, len(record))
+
+
+def migrate(source, target):
+    # Copy every document from one backend to another, oldest -> newest
+    for game_map in source.maps():
+        for kind in KINDS:
+            match_ids = source.matchIds(game_map, kind)
+            for match_id in match_ids:
+                if not target.has(game_map, kind, match_id):
+                    target.write(game_map, kind, match_id, source.read(game_map, kind, match_id))
+            cprint(f'Migrated {len(match_ids)} {game_map} {kind} documents', 'green')
+
+
+
+if __name__ == '__main__':
+    # python -m src.storage migrate
+    # Packs everything under data/historical into data/packed. The original files are left in place;
+    #   set `storage: pack` in data/private.yaml to switch over, then delete data/historical when happy.
+    if sys.argv[1:] == ['migrate']:
+        migrate(FileStorage(), PackStorage())
+    else:
+        print('Usage: python -m src.storage migrate')
@@ -0,0 +1,169 @@
+import json
+import os
+
+import numpy as np
+from termcolor import cprint
+
+from src.timeline import readTimelineFrames
+
+
+# Dense per-minute timeline data for every match of a map
+# data[match, frame, participant, field] as int32, where participant is the index into info.participants
+#   (participantId - 1) and frame is the minute. Frames past the end of a game are 0 - see mask.
+# Saved as a .npy next to the map's historical data and memory-mapped on load, so timelines only ever
+#   get parsed once. New matches are appended the next time the tensor is loaded.
+# The .json meta is what says which matches the tensor holds: it is replaced last, and the data and
+#   lengths files only ever grow by appending, so their first rows always line up with it.
+
+# Bump when the layout or the way it's filled changes - saved tensors are then rebuilt
+TENSOR_VERSION = 1
+
+TENSOR_FIELDS = (
+    'totalGold',
+    'minionsKilled',
+    'jungleMinionsKilled',
+    'xp',
+    'level',
+    'position_x',
+    'position_y',
+)
+FIELD_INDEX = {field: i for i, field in enumerate(TENSOR_FIELDS)}
+
+_frame_fields = ('totalGold', 'minionsKilled', 'jungleMinionsKilled', 'xp', 'level', 'position')
+
+N_PARTICIPANTS = 10
+
+
+class TimelineTensor:
+
+    def __init__(self, data, match_ids, lengths):
+        self.data = data
+        self.match_ids = match_ids
+        self.lengths = lengths # Number of frames each match actually has
+        self._rows = {match_id: i for i, match_id in enumerate(match_ids)}
+
+
+    @property
+    def mask(self):
+        # (matches x frames) True where the frame exists
+        return np.arange(self.data.shape[1]) < self.lengths[:, None]
+
+
+    def rows(self, match_ids):
+        return np.fromiter((self._rows[match_id] for match_id in match_ids), dtype=np.int64, count=len(match_ids))
+
+
+    def laneDiff(self, match_ids, own_idx, rival_idx, minute, field):
+        # Own minus lane opponent's `field` at `minute`, for each match
+        # own_idx/rival_idx are participant indexes per match, rival_idx < 0 for no opponent
+        # NaN where there is no opponent or the game ended before `minute`
+        rows = self.rows(match_ids)
+        own_idx = np.asarray(own_idx, dtype=np.int64)
+        rival_idx = np.asarray(rival_idx, dtype=np.int64)
+        if minute >= self.data.shape[1]:
+            return np.full(len(rows), np.nan)
+
+        valid = (rival_idx >= 0) & (self.lengths[rows] > minute)
+        at_minute = self.data[rows, minute, :, FIELD_INDEX[field]]
+        own = np.take_along_axis(at_minute, own_idx[:, None], axis=1)[:, 0]
+        rival = np.take_along_axis(at_minute, np.where(valid, rival_idx, 0)[:, None], axis=1)[:, 0]
+        return np.where(valid, own - rival, np.nan)
+
+
+    def curves(self, match_ids, participant_idx, field):
+        # (matches x frames) per-minute values of `field` for one participant per match, NaN after the game ended
+        rows = self.rows(match_ids)
+        participant_idx = np.asarray(participant_idx, dtype=np.int64)
+        values = self.data[rows, :, participant_idx, FIELD_INDEX[field]].astype(np.float64)
+        values[~self.mask[rows]] = np.nan
+        return values
+
+
+def _parseTimeline(storage, game_map, match_id):
+    # (frames x participants x fields) for one match
+    with storage.open(game_map, 'timeline', match_id) as f:
+        frames = readTimelineFrames(f, None, _frame_fields)
+
+    out = np.zeros((len(frames), N_PARTICIPANTS, len(TENSOR_FIELDS)), dtype=np.int32)
+    for frame_idx, participant_frames in frames.items():
+        for participant_id, values in participant_frames.items():
+            p = int(participant_id) - 1
+            if not 0 <= p < N_PARTICIPANTS:
+                continue
+            out[frame_idx, p, :5] = [values[field] for field in _frame_fields[:5]]
+            out[frame_idx, p, 5] = values['position']['x']
+            out[frame_idx, p, 6] = values['position']['y']
+    return out
+
+
+def loadTimelineTensor(storage, catalog, game_map):
+    base_dir = storage.base_dir / game_map
+    data_path = base_dir / 'timeline_tensor.npy'
+    lengths_path = base_dir / 'timeline_tensor_lengths.npy'
+    meta_path = base_dir / 'timeline_tensor.json'
+
+    old_ids = []
+    if data_path.exists() and meta_path.exists():
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta['version'] == TENSOR_VERSION and meta['fields'] == list(TENSOR_FIELDS):
+            old_ids = meta['match_ids']
+        else:
+            cprint('Timeline tensor is out of date - rebuilding', 'yellow')
+
+    old_data = None
+    old_lengths = np.zeros(0, dtype=np.int32)
+    if old_ids:
+        # An update interrupted before its meta was replaced leaves rows past the meta's matches - ignore them
+        old_data = np.load(data_path, mmap_mode='r')
+        old_lengths = np.load(lengths_path) if lengths_path.exists() else old_lengths
+        if len(old_data) < len(old_ids) or len(old_lengths) < len(old_ids):
+            cprint('Timeline tensor is incomplete - rebuilding', 'yellow')
+            old_ids, old_data, old_lengths = [], None, np.zeros(0, dtype=np.int32)
+        else:
+            old_data = old_data[:len(old_ids)]
+            old_lengths = old_lengths[:len(old_ids)]
+
+    known = set(old_ids)
+    new_ids = [match_id for match_id in catalog.matchIds(game_map) if match_id not in known]
+    if not new_ids:
+        if not old_ids:
+            return TimelineTensor(np.zeros((0, 0, N_PARTICIPANTS, len(TENSOR_FIELDS)), dtype=np.int32), [], np.zeros(0, dtype=np.int32))
+        return TimelineTensor(old_data, old_ids, old_lengths)
+
+    cprint(f'Adding {len(new_ids)} timelines to the timeline tensor', 'green')
+    new_data = [_parseTimeline(storage, game_map, match_id) for match_id in new_ids]
+
+    n_frames = max([len(x) for x in new_data] + ([old_data.shape[1]] if old_data is not None else []))
+    shape = (len(old_ids) + len(new_ids), n_frames, N_PARTICIPANTS, len(TENSOR_FIELDS))
+
+    # Build the extended tensor in temp files and swap them in, meta last, so an interrupted update keeps the old one
+    tmp_path = base_dir / 'timeline_tensor.npy.tmp'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.int32, shape=shape)
+    chunk = 1024
+    for start in range(0, len(old_ids), chunk):
+        rows = old_data[start:start + chunk]
+        out[start:start + len(rows), :rows.shape[1]] = rows
+        out[start:start + len(rows), rows.shape[1]:] = 0
+    for i, match_data in enumerate(new_data):
+        row = len(old_ids) + i
+        out[row, :len(match_data)] = match_data
+        out[row, len(match_data):] = 0
+    out.flush()
+    del out, old_data
+
+    lengths = np.concatenate([old_lengths, np.array([len(x) for x in new_data], dtype=np.int32)])
+    match_ids = old_ids + new_ids
+
+    lengths_tmp_path = base_dir / 'timeline_tensor_lengths.npy.tmp'
+    meta_tmp_path = base_dir / 'timeline_tensor.json.tmp'
+    with open(lengths_tmp_path, 'wb') as f:
+        np.save(f, lengths)
+    with open(meta_tmp_path, 'w') as f:
+        json.dump({'version': TENSOR_VERSION, 'fields': list(TENSOR_FIELDS), 'match_ids': match_ids}, f)
+
+    os.replace(tmp_path, data_path)
+    os.replace(lengths_tmp_path, lengths_path)
+    os.replace(meta_tmp_path, meta_path)
+
+    return TimelineTensor(np.load(data_path, mmap_mode='r'), match_ids, lengths)
@@ -0,0 +1,102 @@
+import json
+import re
+
+
+# Partial reader for match-v5 timeline files
+# Timelines hold every frame and event of a game (often several MB), but most consumers only need a
+#   couple of early frames. This decodes frames one at a time and stops reading once it has the last
+#   frame asked for, so cost per match no longer grows with game length.
+
+_frames_start = re.compile(r'"frames"\s*:\s*\[')
+_separators = ' \t\n\r,'
+_decoder = json.JSONDecoder()
+
+
+def _iterFrames(f, chunk_size):
+    # Yields each element of info.frames in order, reading f only as far as needed
+    buffer = ''
+    pos = None
+    eof = False
+
+    def readMore(size):
+        nonlocal buffer, eof
+        chunk = f.read(size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    # Find the start of the frames array
+    while pos is None:
+        match = _frames_start.search(buffer)
+        if match is not None:
+            pos = match.end()
+        elif eof:
+            raise ValueError('No frames array found in timeline')
+        else:
+            # Keep a tail in case the key is split across chunks
+            buffer = buffer[-32:]
+            readMore(chunk_size)
+
+    read_size = chunk_size
+    while True:
+        while pos < len(buffer) and buffer[pos] in _separators:
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                raise ValueError('Timeline ended inside frames array')
+            readMore(read_size)
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            frame, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Most likely the frame is cut off at the end of the buffer - read more and retry
+            if eof:
+                raise
+            buffer = buffer[pos:]
+            pos = 0
+            readMore(read_size)
+            read_size *= 2
+            continue
+
+        read_size = chunk_size
+        yield frame
+        pos = end
+
+        # Drop what has already been decoded so the buffer stays around one frame in size
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def readTimelineFrames(f, frame_indices, fields=None, chunk_size=64*1024):
+    # f is an open text file over a timeline document (see src.storage)
+    # Returns {frame_idx: participantFrames} for each requested frame the game actually reached
+    #   (frame_indices=None means every frame)
+    # If fields is given, each participant frame is cut down to just those keys
+    wanted = None if frame_indices is None else set(frame_indices)
+    last_frame = None if wanted is None else max(wanted)
+    frames = {}
+
+    for frame_idx, frame in enumerate(_iterFrames(f, chunk_size)):
+        if wanted is None or frame_idx in wanted:
+            participant_frames = frame['participantFrames']
+            if fields is not None:
+                participant_frames = {
+                    participant_id: {field: participant_frame[field] for field in fields}
+                    for participant_id, participant_frame in participant_frames.items()
+                }
+            frames[frame_idx] = participant_frames
+        if last_frame is not None and frame_idx >= last_frame:
+            break
+
+    return frames
+
+
+def readTimelineEvents(f, chunk_size=64*1024):
+    # Yields every event of the game in order (frame by frame), each as the raw event dict
+    # Unlike readTimelineFrames this has to go through the whole document
+    for frame in _iterFrames(f, chunk_size):
+        yield from frame.get('events', ())
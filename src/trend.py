@@ -0,0 +1,211 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# Trendlines for the dashboard's per-game scatter plots
+# plotly's trendline='lowess' runs statsmodels LOWESS, which fits a weighted regression per point over
+#   frac * n neighbours - O(n^2) - and is redone for every figure on every start.
+# Each engine here is vectorized, and can extend a previous fit when games are appended to the end
+#   instead of starting over (TrendCache keeps the previous fits around).
+#
+# x is game_index (ascending), y the metric. NaN values of y are dropped before fitting.
+
+# state is engine-specific, used by extend()
+Trend = namedtuple('Trend', ['x', 'y', 'lower', 'upper', 'state'])
+
+
+def _clean(x, y):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = ~np.isnan(y)
+    return x[keep], y[keep]
+
+
+class BinnedLowess:
+    # LOWESS on binned data: points are reduced to per-bin sums (count, x, y, x^2, xy), then a tricube
+    #   weighted linear fit is solved at every bin centre from those sums. Cost is O(n + bins^2).
+    # The window matches statsmodels' frac (the nearest frac * n points).
+    # No robustifying iterations, so single outliers pull the line a little more than plotly's does.
+
+    def __init__(self, frac=0.1, bins=256):
+        self.frac = frac
+        self.bins = bins
+
+
+    def fit(self, x, y):
+        x, y = _clean(x, y)
+        if len(x) == 0:
+            return Trend(x, y, None, None, None)
+        width = max((x[-1] - x[0]) / self.bins, 1.0)
+        state = {'x0': x[0], 'width': width, 'sums': np.zeros((5, 0)), 'n': 0}
+        return self._smooth(self._addPoints(state, x, y))
+
+
+    def extend(self, trend, x, y):
+        # Only the new points get binned - the smoothing pass over the bins is redone
+        if trend.state is None:
+            return self.fit(x, y)
+        x, y = _clean(x, y)
+        state = dict(trend.state)
+        return self._smooth(self._addPoints(state, x[state['n']:], y[state['n']:]))
+
+
+    def _addPoints(self, state, x, y):
+        if len(x):
+            n_bins = int((x[-1] - state['x0']) // state['width']) + 1
+            # Halve the resolution instead of letting the bin count grow without bound
+            while n_bins > 2 * self.bins:
+                sums = state['sums']
+                if sums.shape[1] % 2:
+                    sums = np.concatenate([sums, np.zeros((5, 1))], axis=1)
+                state['sums'] = sums[:, 0::2] + sums[:, 1::2]
+                state['width'] *= 2
+                n_bins = int((x[-1] - state['x0']) // state['width']) + 1
+
+            idx = ((x - state['x0']) // state['width']).astype(np.int64)
+            sums = np.zeros((5, n_bins))
+            sums[:, :state['sums'].shape[1]] = state['sums']
+            for i, values in enumerate((np.ones_like(x), x, y, x * x, x * y)):
+                sums[i] += np.bincount(idx, weights=values, minlength=n_bins)
+            state['sums'] = sums
+            state['n'] += len(x)
+        return state
+
+
+    def _smooth(self, state):
+        count, sx, sy, sxx, sxy = state['sums']
+        occupied = count > 0
+        centres = sx[occupied] / count[occupied]
+
+        # Like statsmodels, each fit's window reaches out to its frac * n nearest points - so it shifts
+        #   inwards at the ends instead of shrinking. Never narrower than a couple of bins.
+        distance = np.abs(centres[:, None] - centres[None, :])
+        order = np.argsort(distance, axis=1, kind='stable')
+        nearest = np.cumsum(count[occupied][order], axis=1)
+        kth = np.argmax(nearest >= self.frac * state['n'], axis=1)
+        h = np.take_along_axis(distance, order, axis=1)[np.arange(len(centres)), kth]
+        h = np.maximum(h, 2 * state['width'])
+
+        # weights[i, j] - tricube weight of bin j for the fit at bin i
+        weights = np.clip(1 - (distance / h[:, None]) ** 3, 0, None) ** 3
+
+        s0, s1, s2, t0, t1 = (weights @ values[occupied] for values in (count, sx, sxx, sy, sxy))
+        denominator = s0 * s2 - s1 * s1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(np.abs(denominator) > 1e-12, (s0 * t1 - s1 * t0) / denominator, 0.0)
+            fitted = (t0 - slope * s1) / s0 + slope * centres
+        return Trend(centres, fitted, None, None, state)
+
+
+class Ewma:
+    # Exponentially weighted moving average over games - each game's weight decays by (1 - alpha)
+
+    def __init__(self, span=20):
+        self.alpha = 2 / (span + 1)
+
+
+    def fit(self, x, y):
+        x, y = _clean(x, y)
+        smoothed = pd.Series(y).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+        return Trend(x, smoothed, None, None, None)
+
+
+    def extend(self, trend, x, y):
+        x, y = _clean(x, y)
+        n = len(trend.x)
+        if n == 0:
+            return self.fit(x, y)
+        # Seeding with the last smoothed value continues the recurrence exactly
+        tail = np.concatenate([trend.y[-1:], y[n:]])
+        smoothed = pd.Series(tail).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()[1:]
+        return Trend(x, np.concatenate([trend.y, smoothed]), None, None, None)
+
+
+class RollingMedian:
+    # Median of the last `window` games, with a band giving the ~95% confidence interval of that median
+    # The interval comes from order statistics: the median of m values lies between the
+    #   m/2 -+ 0.98 * sqrt(m) ranked values with ~95% confidence, so the band is two rolling quantiles
+
+    def __init__(self, window=25, z=1.96):
+        self.window = window
+        self.z = z
+
+
+    def fit(self, x, y):
+        x, y = _clean(x, y)
+        median, lower, upper = self._roll(y)
+        return Trend(x, median, lower, upper, None)
+
+
+    def extend(self, trend, x, y):
+        # Only the last window - 1 old games can change anything, so just those get rolled again
+        x, y = _clean(x, y)
+        n = len(trend.x)
+        if n == 0:
+            return self.fit(x, y)
+        start = max(n - self.window + 1, 0)
+        median, lower, upper = (part[n - start:] for part in self._roll(y[start:]))
+        return Trend(
+            x,
+            np.concatenate([trend.y, median]),
+            np.concatenate([trend.lower, lower]),
+            np.concatenate([trend.upper, upper]),
+            None,
+        )
+
+
+    def _roll(self, y):
+        rolling = pd.Series(y).rolling(self.window, min_periods=1)
+        spread = min(self.z / 2 / np.sqrt(self.window), 0.5)
+        return (
+            rolling.median().to_numpy(),
+            rolling.quantile(0.5 - spread, interpolation='lower').to_numpy(),
+            rolling.quantile(0.5 + spread, interpolation='higher').to_numpy(),
+        )
+
+
+TRENDLINES = {
+    'lowess': BinnedLowess,
+    'ewma': Ewma,
+    'median': RollingMedian,
+}
+
+
+class TrendCache:
+    # Fitted trendlines by key (eg. metric + filters), kept across dataset versions
+    # If the new data only has games appended to what was fitted before, the fit is extended
+    #   rather than redone
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {} # (key, method, options): (x, y, trend)
+
+
+    def get(self, key, method, x, y, **options):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        engine = TRENDLINES[method](**options)
+
+        with self._lock:
+            cached = self._items.get((key, method, tuple(sorted(options.items()))))
+
+        if cached is not None:
+            old_x, old_y, trend = cached
+            n = len(old_x)
+            same_prefix = (
+                len(x) >= n
+                and np.array_equal(x[:n], old_x)
+                and np.array_equal(y[:n], old_y, equal_nan=True)
+            )
+            if same_prefix and len(x) == n:
+                return trend
+            trend = engine.extend(trend, x, y) if same_prefix else engine.fit(x, y)
+        else:
+            trend = engine.fit(x, y)
+
+        with self._lock:
+            self._items[(key, method, tuple(sorted(options.items())))] = (x, y, trend)
+        return trend